@@ -0,0 +1,357 @@
+import hashlib
+import json
+import os
+import math
+import shutil
+import threading
+import time
+import tkinter as tk
+from collections import OrderedDict
+
+from PIL import Image, ImageSequence, ImageTk
+
+import lottie_render
+
+CACHE_DIR = os.path.join("cache", "animations")
+MAX_ANIMATION_BYTES = 48 * 1024 * 1024  # Decoded frames kept for animations not on screen
+DEFAULT_DURATION = 100  # Milliseconds, for frames whose GIF metadata has none
+MIN_DURATION = 20  # Shorter frame delays are treated as unset, as browsers do
+WAIT_INTERVAL = 10  # Milliseconds between checks while frame 0 is still decoding
+MAX_LAG = 1.0  # Seconds behind schedule after which an animation restarts its clock
+
+
+def iter_frames(gif_file, size):
+    # Decode and resize the frames of an animation one at a time, with their duration in ms
+    with Image.open(gif_file) as gif:
+        for frame in ImageSequence.Iterator(gif):
+            duration = frame.info.get('duration') or 0
+            if duration < MIN_DURATION:
+                duration = DEFAULT_DURATION
+            yield frame.convert('RGBA').resize(size, Image.Resampling.LANCZOS), duration
+
+
+def is_lottie(path):
+    return path.lower().endswith('.json')
+
+
+def file_stamp(path):
+    # Lottie files are small, so they are keyed by content and by how many of
+    # their frames are rendered; GIFs by mtime
+    if is_lottie(path):
+        with open(path, 'rb') as f:
+            return f"{hashlib.sha1(f.read()).hexdigest()}-{lottie_render.MAX_FRAMES}"
+    return os.stat(path).st_mtime_ns
+
+
+class FrameStream:
+    # Frames of one (file, size), produced on a worker thread from a GIF or a
+    # Lottie JSON file. Readers on the Tk
+    # thread see a growing prefix: `frames` only ever has items appended, and
+    # `done` is set once the last frame is in (or decoding failed). Once
+    # decoding and the disk cache write are done, a PIL frame is dropped as
+    # soon as its Tk image exists, so each frame is held once, as a Tk image.
+    def __init__(self, cache, key, source, size):
+        self.cache = cache
+        self.key = key
+        self.source = source
+        self.size = size
+        self.frames = []
+        self.durations = []
+        self.photos = []  # Tk images built so far, Tk thread only
+        self.released = 0  # frames[:released] are None, their Tk images built
+        self.error = None
+        self.done = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def run(self):
+        try:
+            from_disk = self.cache.use_disk and self.cache.load_from_disk(self.key, self)
+            if not from_disk:
+                if is_lottie(self.source):
+                    frames = lottie_render.iter_lottie_frames(self.source, self.size)
+                else:
+                    frames = iter_frames(self.source, self.size)
+                for frame, duration in frames:
+                    self.durations.append(duration)
+                    self.frames.append(frame)
+                if self.cache.use_disk:
+                    self.cache.save_to_disk(self.key, self.frames, self.durations)
+        except Exception as e:
+            self.error = e
+            print(f"Error while decoding {self.source}: {e}")
+        finally:
+            self.done.set()
+
+    def available(self):
+        return len(self.frames)
+
+    def photo(self, index):
+        # Tk image for a decoded frame, built the first time it is shown
+        while len(self.photos) <= index:
+            self.photos.append(ImageTk.PhotoImage(self.frames[len(self.photos)]))
+        if self.done.is_set():
+            # Decoded and written to disk: the Tk images are all that is needed now
+            while self.released < len(self.photos):
+                self.frames[self.released] = None
+                self.released += 1
+        return self.photos[index]
+
+    def cost(self):
+        # Bytes of decoded pixels held, as PIL frames or as Tk images
+        return self.available() * self.size[0] * self.size[1] * 4
+
+
+class AnimationCache:
+    # Decoded, resized animation frames keyed by (file, size, mtime or hash). An
+    # entry is decoded once and kept for later screen transitions within
+    # max_bytes; beyond that the least recently requested go first, and an
+    # evicted animation still on screen lives on in its player until its label
+    # is destroyed. With use_disk the resized frames are also written under
+    # cache/animations so the next start skips the resample; writing an entry
+    # removes the ones of the same (file, size) with an older mtime or hash.
+    def __init__(self, directory=CACHE_DIR, use_disk=True, max_bytes=MAX_ANIMATION_BYTES):
+        self.directory = directory
+        self.use_disk = use_disk
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.streams = OrderedDict()  # key -> FrameStream, least recently requested first
+        self.aliases = {}  # Key of a Lottie file that cannot be rendered -> key of its fallback
+
+    def key(self, source, size):
+        return (os.path.abspath(source), size, file_stamp(source))
+
+    def disk_prefix(self, key):
+        path, size, _ = key
+        return hashlib.sha1(f"{path}|{size[0]}x{size[1]}".encode()).hexdigest()
+
+    def disk_path(self, key):
+        stamp = hashlib.sha1(str(key[2]).encode()).hexdigest()[:16]
+        return os.path.join(self.directory, f"{self.disk_prefix(key)}-{stamp}")
+
+    def remove_stale(self, key):
+        # Entries (and leftover .tmp directories) of the same file and size
+        # from an older version of the file, and entries named before the
+        # "<file and size>-<version>" scheme
+        current = os.path.basename(self.disk_path(key))
+        prefix = self.disk_prefix(key) + '-'
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if (name.startswith(prefix) or '-' not in name) and name != current:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def load_from_disk(self, key, stream):
+        # Fill the stream from a previous run's frames; False if there are none
+        directory = self.disk_path(key)
+        try:
+            with open(os.path.join(directory, 'durations.json')) as f:
+                durations = json.load(f)
+        except (OSError, ValueError):
+            return False
+        try:
+            for index, duration in enumerate(durations):
+                with Image.open(os.path.join(directory, f"{index:04d}.png")) as frame:
+                    frame.load()
+                stream.durations.append(duration)
+                stream.frames.append(frame)
+        except OSError:
+            shutil.rmtree(directory, ignore_errors=True)  # Damaged entry, decode afresh next time
+            raise
+        return True
+
+    def save_to_disk(self, key, frames, durations):
+        directory = self.disk_path(key)
+        tmp_directory = f"{directory}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(tmp_directory, exist_ok=True)
+            for index, frame in enumerate(frames):
+                frame.save(os.path.join(tmp_directory, f"{index:04d}.png"), compress_level=1)
+            with open(os.path.join(tmp_directory, 'durations.json'), 'w') as f:
+                json.dump(durations, f)
+            os.replace(tmp_directory, directory)
+            self.remove_stale(key)
+        except OSError as e:
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+            print(f"Could not write animation cache: {e}")
+
+    def stream(self, source, size, fallback=None):
+        # Returns at once; frames keep arriving on a worker thread. A Lottie source
+        # that cannot be rasterized here (no lottie package, or layers that need
+        # cairosvg) is replaced by `fallback`, typically the same animation as a GIF.
+        key = self.key(source, size)
+        with self.lock:
+            cached = self.aliases.get(key, key)
+            stream = self.streams.get(cached)
+            if stream is not None:
+                self.streams.move_to_end(cached)
+        if stream is not None and stream.error is None:
+            return stream
+        if fallback and is_lottie(source) and not lottie_render.can_render(source):
+            # Stored once, under the fallback's own key, so evict() counts it once
+            stream = self.stream(fallback, size)
+            with self.lock:
+                self.aliases[key] = stream.key
+            return stream
+        stream = FrameStream(self, key, source, size).start()
+        with self.lock:
+            self.streams[key] = stream
+            self.evict()
+        return stream
+
+    def evict(self):
+        # Called with the lock held; the newest stream always stays
+        total = sum(stream.cost() for stream in self.streams.values())
+        while total > self.max_bytes and len(self.streams) > 1:
+            _, evicted = self.streams.popitem(last=False)
+            total -= evicted.cost()
+
+
+class AnimationPlayer:
+    # Shows a FrameStream on a label, each frame for its own GIF duration. Playback
+    # starts as soon as frame 0 exists and loops over the frames decoded so far
+    # until the rest arrive. `due` is the monotonic time the current frame ends.
+    # advance() returns False once the stream is done without a single frame
+    # (the GIF failed to decode), as there will never be anything to show.
+    def __init__(self, label, stream):
+        self.label = label
+        self.stream = stream
+        self.index = None
+        self.due = None
+        self.paused = False
+
+    def duration(self, index):
+        return self.stream.durations[index] / 1000
+
+    def advance(self, now):
+        count = self.stream.available()
+        if not count:
+            if self.stream.done.is_set():
+                return False
+            self.due = now + WAIT_INTERVAL / 1000
+            return True
+        if self.index is None:
+            self.index = 0
+            self.due = now + self.duration(0)
+        else:
+            if now - self.due > MAX_LAG:
+                self.due = now  # Stalled for long (e.g. a dialog), start over from here
+            # Deadlines advance from the previous deadline, not from now, so timer
+            # jitter never accumulates; frames whose slot already passed are skipped
+            while self.due <= now:
+                self.index = self.index + 1 if self.index + 1 < count else 0
+                self.due += self.duration(self.index)
+        self.label.config(image=self.stream.photo(self.index))
+        return True
+
+
+class AnimationManager:
+    # Owns every running animation of a window and drives them all from one
+    # after() timer, which only wakes when the earliest frame is due. Each
+    # animation lives exactly as long as its label: destroying the label stops
+    # it, and it is paused while the label is not viewable (it or one of its
+    # ancestors unmapped).
+    def __init__(self, root):
+        self.root = root
+        self.players = {}  # label -> AnimationPlayer
+        self.bound = set()  # Labels whose lifetime events are already bound
+        self.after_id = None
+        self.wake_at = None
+        # Mapping the window itself sends no <Map> to the labels inside it either
+        root.bind('<Map>', lambda e: self.update_visibility() if e.widget is root else None, add='+')
+
+    def play(self, label, stream):
+        self.stop(label)  # A label shows one animation at a time
+        player = AnimationPlayer(label, stream)
+        if not player.advance(time.monotonic()):
+            return player
+        self.players[label] = player
+        if label not in self.bound:
+            # The handlers look the player up, so one set of bindings per label
+            # also serves any animation played on it later
+            label.bind('<Destroy>', lambda e: self.forget(label), add='+')
+            label.bind('<Unmap>', lambda e: self.pause(label), add='+')
+            label.bind('<Map>', lambda e: self.resume(label), add='+')
+            self.bound.add(label)
+        self.schedule()
+        return player
+
+    def stop(self, label):
+        if self.players.pop(label, None) is not None and not self.players:
+            self.cancel()
+
+    def forget(self, label):
+        self.stop(label)
+        self.bound.discard(label)
+
+    def pause(self, label):
+        player = self.players.get(label)
+        if player is not None:
+            player.paused = True
+
+    def resume(self, label):
+        player = self.players.get(label)
+        if player is not None and player.paused:
+            player.paused = False
+            player.due = time.monotonic()  # Continue from the current frame, not from the backlog
+            self.schedule()
+
+    def update_visibility(self):
+        # Pause the animations that are no longer viewable and resume the ones
+        # that are again, e.g. after a whole screen was unmapped or mapped
+        for label in list(self.players):
+            try:
+                viewable = label.winfo_viewable()
+            except tk.TclError:
+                self.forget(label)
+                continue
+            if viewable:
+                self.resume(label)
+            else:
+                self.pause(label)
+        self.schedule()
+
+    def cancel(self):
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+
+    def schedule(self):
+        active = [player.due for player in self.players.values() if not player.paused]
+        if not active:
+            self.cancel()
+            return
+        due = min(active)
+        if self.after_id is not None:
+            if self.wake_at <= due:
+                return
+            self.cancel()
+        delay = max(1, math.ceil((due - time.monotonic()) * 1000))
+        self.after_id = self.root.after(delay, self.tick)
+        self.wake_at = due
+
+    def tick(self):
+        self.after_id = None
+        now = time.monotonic()
+        for label, player in list(self.players.items()):
+            if player.paused or player.due > now:
+                continue
+            try:
+                if not label.winfo_viewable():
+                    # winfo_ismapped() stays 1 when only an ancestor, such as a
+                    # screen frame, was unmapped. Resumed by the label's <Map>
+                    # or by update_visibility().
+                    player.paused = True
+                    continue
+                if not player.advance(now):
+                    self.stop(label)
+            except tk.TclError:
+                self.forget(label)
+        self.schedule()
+
+
+animation_cache = AnimationCache()
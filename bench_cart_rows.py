@@ -0,0 +1,134 @@
+import sys
+import time
+import tkinter as tk
+
+import customtkinter as ctk
+from PIL import Image, ImageTk
+
+from cart_view import CartRows, CanvasRows
+from money import format_money, with_price_cents
+from thumbnail_cache import THUMBNAIL_SIZE
+
+# Compares the widget cart rows of checkout.py (CTkFrame, CTkLabel, CTkButton)
+# and of co.py (tk.Frame and tk.Label, with a CTkButton) with the canvas-item
+# rows of CanvasRows: Tk objects per row, time to build N rows and get them on
+# screen, and time to delete a row from the middle. Needs a display (e.g. run
+# under xvfb-run).
+#
+#   python bench_cart_rows.py [rows]
+#
+# Every customtkinter widget is a tk.Frame holding a canvas it draws its rounded
+# shape on, redrawn on each <Configure>, plus a tk.Label for any text. A
+# checkout.py row is therefore 11 Tk windows (frame 2, two labels 3 each,
+# button 3) and a co.py row 7, against no windows and 6 canvas items for a
+# CanvasRows row. Timings have to come from the Pi itself; CANVAS_CART_ROWS in
+# co.py stays off until they do.
+
+
+class FakeLoader:
+    # Thumbnails are already cached, as after the first screen, so the
+    # benchmark measures drawing only
+    def __init__(self):
+        self.placeholder = ImageTk.PhotoImage(Image.new("RGB", THUMBNAIL_SIZE, "#E4E6EE"))
+        self.photos = self
+
+    def get(self, key, size):
+        return self.placeholder
+
+    def show(self, label, img_path):
+        label.configure(image=self.placeholder)
+
+
+def make_products(count):
+    return [with_price_cents({'uid': str(i), 'name': f"Product {i}", 'sellingPrice': i * 0.25, 'image': f"{i}.png", 'quantity': 1}) for i in range(count)]
+
+
+def ctk_rows(parent, loader):
+    # Same widgets as SelfCheckoutSystem.create_cart_row in checkout.py, one row
+    # per line as before VirtualList pooled them
+    def create_row(product):
+        row_frame = ctk.CTkFrame(parent, fg_color="#F6F7FB", corner_radius=0)
+        row_frame.pack(fill='x', pady=10, padx=10)
+        name_label = ctk.CTkLabel(row_frame, text=product['name'], font=("Arial", 16), fg_color="#F6F7FB", text_color="black")
+        name_label.pack(side="left", padx=30)
+        delete_button = ctk.CTkButton(row_frame, text="Delete", fg_color="#F40000", hover_color="#C10000", text_color="white")
+        delete_button.pack(side="right", padx=30)
+        price_label = ctk.CTkLabel(row_frame, text=format_money(product['priceCents']), font=("Arial", 16), fg_color="#F6F7FB", text_color="black")
+        price_label.pack(side="right", padx=30)
+        return {'frame': row_frame}
+
+    return CartRows(create_row, lambda row, old, product: None)
+
+
+def widget_rows(parent, loader):
+    # Same widgets as SelfCheckoutSystem.create_cart_row in co.py
+    def create_row(product):
+        row_frame = tk.Frame(parent, bg="#F6F7FB")
+        row_frame.pack(fill='x', pady=10, padx=10)
+        image_label = tk.Label(row_frame, bg="#F6F7FB")
+        image_label.pack(side='left', padx=10, pady=10)
+        loader.show(image_label, product['image'])
+        name_label = tk.Label(row_frame, text=product['name'], font=("Arial", 16), bg="#F6F7FB", fg="black")
+        name_label.pack(side='left', padx=30)
+        price_label = tk.Label(row_frame, text=format_money(product['priceCents']), font=("Arial", 16), bg="#F6F7FB", fg="black")
+        price_label.pack(side='right', padx=30)
+        delete_button = ctk.CTkButton(row_frame, text="Delete", fg_color="#F40000", hover_color="#C10000", text_color="white")
+        delete_button.pack(side='right', padx=30)
+        return {'frame': row_frame}
+
+    return CartRows(create_row, lambda row, old, product: None)
+
+
+def count_windows(widget):
+    return 1 + sum(count_windows(child) for child in widget.winfo_children())
+
+
+def measure(root, name, make_container, make_rows, products):
+    container = make_container()
+    container.pack(expand=True, fill='both')
+    root.update()
+    empty = count_windows(container)  # A CTkFrame container has its own canvas
+    rows = make_rows(container)
+
+    start = time.perf_counter()
+    rows.sync(products)
+    root.update()
+    build = time.perf_counter() - start
+
+    windows = count_windows(container) - empty
+    items = len(container.find_all()) if isinstance(container, tk.Canvas) else 0
+
+    start = time.perf_counter()
+    rows.remove(products[len(products) // 2]['uid'])
+    root.update()
+    delete = time.perf_counter() - start
+
+    start = time.perf_counter()
+    container.destroy()
+    root.update()
+    teardown = time.perf_counter() - start
+
+    count = len(products)
+    print(f"{name:8} {count:5d} rows  windows {windows:6d}  canvas items {items:6d}  "
+          f"build {build * 1000:8.1f} ms ({build / count * 1000:6.3f} ms/row)  "
+          f"delete {delete * 1000:7.1f} ms  teardown {teardown * 1000:7.1f} ms")
+
+
+def main():
+    counts = [int(sys.argv[1])] if len(sys.argv) > 1 else [10, 50, 200]
+    root = ctk.CTk()
+    root.geometry("1024x600")
+    loader = FakeLoader()
+    for count in counts:
+        products = make_products(count)
+        measure(root, "ctk", lambda: ctk.CTkFrame(root, fg_color="#F6F7FB", corner_radius=0),
+                lambda container: ctk_rows(container, loader), products)
+        measure(root, "widgets", lambda: tk.Frame(root, bg="#F6F7FB"),
+                lambda container: widget_rows(container, loader), products)
+        measure(root, "canvas", lambda: tk.Canvas(root, bg="#F6F7FB", highlightthickness=0),
+                lambda container: CanvasRows(container, print, image_loader=loader), products)
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
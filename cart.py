@@ -0,0 +1,95 @@
+def line_total(line):
+    return line['priceCents'] * line['quantity']
+
+
+def line_name(line):
+    if line['quantity'] == 1:
+        return line['name']
+    return f"{line['name']} x{line['quantity']}"
+
+
+class Cart:
+    # Cart lines in scan order, keyed by UID. A line is the catalog product plus
+    # its 'quantity'; scanning a UID that is already in the cart replaces its
+    # line with one whose quantity is one higher, so views can tell it changed.
+    # The total (integer cents, from the catalog's 'priceCents') is kept up to
+    # date on every change, so a scan, a delete or reading the total never walks
+    # the cart. Listeners registered with subscribe() are called as
+    # listener(event, line) with event "add", "update" or "remove" (line None on
+    # "clear"); add_many() notifies once, with event "bulk" and the list of
+    # lines it changed. Use from the Tk thread only.
+    def __init__(self):
+        self.items = {}  # uid -> line, insertion ordered
+        self.total = 0
+        self.listeners = []
+        self.snapshot = None  # list(self.items.values()), rebuilt after a change
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, uid):
+        return uid in self.items
+
+    def __iter__(self):
+        return iter(self.items.values())
+
+    def get(self, uid):
+        return self.items.get(uid)
+
+    def products(self):
+        # Lines as a list, for views that index by position
+        if self.snapshot is None:
+            self.snapshot = list(self.items.values())
+        return self.snapshot
+
+    def quantities(self):
+        # (uid, quantity) pairs in scan order
+        return [(uid, line['quantity']) for uid, line in self.items.items()]
+
+    def add(self, product):
+        # Returns the line's new quantity
+        line, new = self.put(product)
+        self.notify("add" if new else "update", line)
+        return line['quantity']
+
+    def add_many(self, products):
+        # One unit of each product, for a batch of reads drawn as one update
+        if len(products) == 1:
+            self.add(products[0])
+            return
+        changed = {}
+        for product in products:
+            line, _ = self.put(product)
+            changed[product['uid']] = line
+        if changed:
+            self.notify("bulk", list(changed.values()))
+
+    def put(self, product):
+        # Adds one unit of product without notifying; returns (line, whether new)
+        line = self.items.get(product['uid'])
+        new = line is None
+        line = {**product, 'quantity': 1} if new else {**line, 'quantity': line['quantity'] + 1}
+        self.items[product['uid']] = line
+        self.total += line['priceCents']
+        return line, new
+
+    def remove(self, uid):
+        # Drops the whole line, whatever its quantity
+        line = self.items.pop(uid, None)
+        if line is not None:
+            self.total -= line_total(line)
+            self.notify("remove", line)
+        return line
+
+    def clear(self):
+        self.items.clear()
+        self.total = 0
+        self.notify("clear", None)
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def notify(self, event, line):
+        self.snapshot = None
+        for listener in self.listeners:
+            listener(event, line)
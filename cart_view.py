@@ -0,0 +1,265 @@
+import tkinter as tk
+
+import customtkinter as ctk
+
+from cart import line_name, line_total
+from money import format_money
+from thumbnail_cache import THUMBNAIL_SIZE
+
+CANVAS_ROW_HEIGHT = 120  # Pixels per row drawn by CanvasRows, fits a thumbnail
+
+
+class CartRows:
+    # Keeps exactly one row widget per cart UID. Adding or removing a product
+    # touches only that product's row, and a row whose product changed only has
+    # its labels patched. create_row(product) returns a dict holding at least the
+    # row's 'frame'; update_row(row, old_product, new_product) patches it in place.
+    def __init__(self, create_row, update_row):
+        self.create_row = create_row
+        self.update_row = update_row
+        self.rows = {}  # uid -> (product, row), in display order
+
+    def add(self, product):
+        entry = self.rows.get(product['uid'])
+        if entry is None:
+            self.rows[product['uid']] = (product, self.create_row(product))
+        elif entry[0] != product:
+            self.update_row(entry[1], entry[0], product)
+            self.rows[product['uid']] = (product, entry[1])
+
+    def remove(self, uid):
+        entry = self.rows.pop(uid, None)
+        if entry is not None:
+            entry[1]['frame'].destroy()
+
+    def sync(self, products):
+        # Reconcile with a whole cart; only differences create or destroy widgets
+        wanted = {product['uid'] for product in products}
+        for uid in [uid for uid in self.rows if uid not in wanted]:
+            self.remove(uid)
+        for product in products:
+            self.add(product)
+
+    def reset(self):
+        # Forget the rows after their container was destroyed with the screen
+        self.rows.clear()
+
+
+class VirtualList:
+    # Scrolling list on a canvas that only owns enough row widgets to fill the
+    # visible area. Rows are fixed height; as the view scrolls, rows that leave
+    # the top or bottom are moved and refilled with the items coming into view,
+    # so widget count depends on the canvas height, not on len(items).
+    # create_row(parent) returns a dict holding at least the row's 'frame',
+    # with every widget of the row already created; show_row(row, item, index)
+    # fills it with one item.
+    def __init__(self, canvas, row_height, create_row, show_row, scrollbar=None, gap=10):
+        self.canvas = canvas
+        self.row_height = row_height
+        self.create_row = create_row
+        self.show_row = show_row
+        self.scrollbar = scrollbar
+        self.gap = gap
+        self.items = []
+        self.pool = []  # [row, canvas window id, (index, item) shown or None]
+        self.layout_pending = False
+        canvas.configure(yscrollcommand=self.on_scroll)
+        canvas.bind("<Configure>", lambda e: self.refresh(), add="+")
+        # Touch drag and wheel scrolling, bound once on two bindtags of this
+        # list. scan_dragto keeps the content under the finger.
+        self.scroll_tag = f"VirtualList{id(self)}"
+        self.drag_tag = f"VirtualListDrag{id(self)}"
+        canvas.bind_class(self.drag_tag, "<Button-1>", lambda e: canvas.scan_mark(0, e.y_root))
+        canvas.bind_class(self.drag_tag, "<B1-Motion>", lambda e: canvas.scan_dragto(0, e.y_root, gain=1))
+        canvas.bind_class(self.scroll_tag, "<MouseWheel>", lambda e: canvas.yview_scroll(int(-1 * (e.delta / 120)), "units"))
+        canvas.bind_class(self.scroll_tag, "<Button-4>", lambda e: canvas.yview_scroll(-1, "units"))
+        canvas.bind_class(self.scroll_tag, "<Button-5>", lambda e: canvas.yview_scroll(1, "units"))
+        self.bind_scrolling(canvas)
+
+    def bind_scrolling(self, widget, drag=True):
+        # Rows cover the canvas, and their labels and buttons cover the rows
+        # (customtkinter widgets are themselves a canvas and a label or frame),
+        # so the tags go on every widget of a row, not just its frame. Buttons
+        # act on press, so a drag starting on one would also press it: they
+        # only get the wheel.
+        drag = drag and not isinstance(widget, (tk.Button, ctk.CTkButton))
+        tags = (self.scroll_tag, self.drag_tag) if drag else (self.scroll_tag,)
+        widget.bindtags(widget.bindtags()[:1] + tags + widget.bindtags()[1:])
+        for child in widget.winfo_children():
+            self.bind_scrolling(child, drag)
+
+    def set_items(self, items):
+        self.items = items
+        self.refresh()
+
+    def refresh(self):
+        width = self.canvas.winfo_width()
+        height = max(len(self.items) * self.row_height, self.canvas.winfo_height())
+        self.canvas.configure(scrollregion=(0, 0, width, height))
+        self.layout()
+
+    def on_scroll(self, first, last):
+        if self.scrollbar is not None:
+            self.scrollbar.set(first, last)
+        if not self.layout_pending:
+            # Coalesce the scroll events of one drag motion into one layout pass
+            self.layout_pending = True
+            self.canvas.after_idle(self.layout)
+
+    def layout(self):
+        self.layout_pending = False
+        top = int(self.canvas.canvasy(0))
+        first = max(0, top // self.row_height)
+        visible = self.canvas.winfo_height() // self.row_height + 2
+        width = max(1, self.canvas.winfo_width() - 2 * self.gap)
+        while len(self.pool) < visible:
+            row = self.create_row(self.canvas)
+            self.bind_scrolling(row['frame'])
+            window = self.canvas.create_window(self.gap, 0, window=row['frame'], anchor="nw", state="hidden")
+            self.pool.append([row, window, None])
+
+        # Each item index always lands in the same pool slot (index % pool size),
+        # so a row scrolling out at one end is the one reused at the other
+        for index in range(first, first + len(self.pool)):
+            entry = self.pool[index % len(self.pool)]
+            row, window, shown = entry
+            if index >= len(self.items):
+                if shown is not None:
+                    self.canvas.itemconfigure(window, state="hidden")
+                    entry[2] = None
+                continue
+            item = self.items[index]
+            if shown is None or shown[0] != index or shown[1] is not item:
+                self.show_row(row, item, index)
+                entry[2] = (index, item)
+            self.canvas.coords(window, self.gap, index * self.row_height)
+            self.canvas.itemconfigure(window, state="normal", width=width, height=self.row_height - self.gap)
+
+
+class CanvasRows:
+    # Cart rows drawn as items on a single tk.Canvas instead of one frame,
+    # labels and a CTkButton per row, which are each a Tk window (the CTk ones
+    # with their own canvas). Same add/remove/sync/reset interface as CartRows;
+    # the "Delete" button is a rectangle and text, hit-tested by canvas tags.
+    # Rows show Cart lines: the name with its quantity and the line total.
+    def __init__(self, canvas, on_delete, image_loader=None, row_height=CANVAS_ROW_HEIGHT, font=("Arial", 16)):
+        self.canvas = canvas
+        self.on_delete = on_delete
+        self.image_loader = image_loader
+        self.row_height = row_height
+        self.font = font
+        self.rows = {}  # uid -> (product, row), in display order
+        self.uids = {}  # row tag -> uid, for hit-testing
+        self.order = []  # uids top to bottom
+        self.next_id = 0
+        self.width = max(1, canvas.winfo_width())
+        canvas.tag_bind("delete", "<Button-1>", self.on_click)
+        canvas.tag_bind("delete", "<Enter>", lambda e: self.hover("#C10000"))
+        canvas.tag_bind("delete", "<Leave>", lambda e: self.hover("#F40000"))
+        canvas.bind("<Configure>", self.on_resize, add="+")
+
+    def add(self, product):
+        entry = self.rows.get(product['uid'])
+        if entry is None:
+            self.rows[product['uid']] = (product, self.draw(product, len(self.order)))
+            self.order.append(product['uid'])
+            self.update_scrollregion()
+        elif entry[0] != product:
+            self.patch(entry[1], entry[0], product)
+            self.rows[product['uid']] = (product, entry[1])
+
+    def remove(self, uid):
+        entry = self.rows.pop(uid, None)
+        if entry is None:
+            return
+        row = entry[1]
+        self.canvas.delete(row['tag'])
+        del self.uids[row['tag']]
+        index = self.order.index(uid)
+        del self.order[index]
+        for below in self.order[index:]:
+            self.canvas.move(self.rows[below][1]['tag'], 0, -self.row_height)
+        self.update_scrollregion()
+
+    def sync(self, products):
+        wanted = {product['uid'] for product in products}
+        for uid in [uid for uid in self.rows if uid not in wanted]:
+            self.remove(uid)
+        for product in products:
+            self.add(product)
+
+    def reset(self):
+        self.canvas.delete("row")
+        self.rows.clear()
+        self.uids.clear()
+        self.order.clear()
+
+    def draw(self, product, index):
+        tag = f"row{self.next_id}"
+        self.next_id += 1
+        self.uids[tag] = product['uid']
+        top = index * self.row_height
+        middle = top + self.row_height // 2
+        right = self.width - 30
+        canvas = self.canvas
+        row = {'tag': tag}
+        row['image'] = canvas.create_image(10, middle, anchor="w", tags=("row", tag))
+        row['name'] = canvas.create_text(140, middle, anchor="w", text=line_name(product), font=self.font, fill="black", tags=("row", tag))
+        canvas.create_rectangle(right - 140, middle - 14, right, middle + 14, fill="#F40000", outline="", tags=("row", tag, "right", "delete", "button"))
+        canvas.create_text(right - 70, middle, text="Delete", fill="white", font=self.font, tags=("row", tag, "right", "delete"))
+        row['price'] = canvas.create_text(right - 170, middle, anchor="e", text=format_money(line_total(product)), font=self.font, fill="black", tags=("row", tag, "right"))
+        self.show_image(row, product['image'])
+        return row
+
+    def patch(self, row, old, product):
+        if old['name'] != product['name'] or old['quantity'] != product['quantity']:
+            self.canvas.itemconfigure(row['name'], text=line_name(product))
+        if line_total(old) != line_total(product):
+            self.canvas.itemconfigure(row['price'], text=format_money(line_total(product)))
+        if old['image'] != product['image']:
+            self.show_image(row, product['image'])
+
+    def show_image(self, row, img_path):
+        loader = self.image_loader
+        if loader is None:
+            return
+        photo = loader.photos.get(img_path, THUMBNAIL_SIZE)
+        if photo is None:
+            photo = loader.placeholder
+
+            def on_ready(pil_image):
+                photo = loader.photos.put(img_path, THUMBNAIL_SIZE, pil_image)
+                if row['tag'] in self.uids:
+                    self.canvas.itemconfigure(row['image'], image=photo)
+                    row['photo'] = photo
+
+            loader.request(img_path, on_ready)
+        self.canvas.itemconfigure(row['image'], image=photo)
+        row['photo'] = photo  # Keep a reference past cache eviction
+
+    def row_uid(self, item):
+        for tag in self.canvas.gettags(item):
+            if tag in self.uids:
+                return self.uids[tag]
+        return None
+
+    def on_click(self, event):
+        uid = self.row_uid("current")
+        if uid is not None:
+            self.on_delete(uid)
+
+    def hover(self, color):
+        uid = self.row_uid("current")
+        if uid is not None:
+            tag = self.rows[uid][1]['tag']
+            self.canvas.itemconfigure(f"{tag}&&button", fill=color)
+
+    def on_resize(self, event):
+        # Price and button hug the right edge
+        if event.width != self.width:
+            self.canvas.move("right", event.width - self.width, 0)
+            self.width = event.width
+            self.update_scrollregion()
+
+    def update_scrollregion(self):
+        self.canvas.configure(scrollregion=(0, 0, self.width, len(self.order) * self.row_height))
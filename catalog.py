@@ -0,0 +1,211 @@
+import json
+import sqlite3
+import threading
+import time
+
+import requests
+
+from money import with_price_cents
+
+CATALOG_DB = "catalog.db"
+REQUEST_TIMEOUT = 15  # Seconds to wait for the products API
+REFRESH_INTERVAL = 300  # Seconds between background catalog syncs
+
+
+class CatalogError(Exception):
+    pass
+
+
+class CatalogStore:
+    # Local SQLite snapshot of the active products, keyed by RFID uid
+    def __init__(self, path=CATALOG_DB):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS products (uid TEXT PRIMARY KEY, data TEXT NOT NULL)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def load(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT uid, data FROM products").fetchall()
+        return {uid: json.loads(data) for uid, data in rows}
+
+    def apply(self, upserts, removals, meta=None):
+        # Write only the changed rows, together with the sync state, in one transaction
+        rows = [(uid, json.dumps(product)) for uid, product in upserts.items()]
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO products (uid, data) VALUES (?, ?)", rows)
+            self.conn.executemany("DELETE FROM products WHERE uid = ?", [(uid,) for uid in removals])
+            for key, value in (meta or {}).items():
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def get_meta(self, key, default=None):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class CatalogSync:
+    # Incremental sync against the products API. The request is conditional on
+    # the last ETag/Last-Modified, so an unchanged catalog costs a 304 and no JSON
+    # decoding. The newest updatedAt seen is sent back as a watermark. A server
+    # that honours it answers with only the changed products and marks the answer
+    # "X-Catalog-Delta: true"; a delta never removes the products it leaves out.
+    # Any other answer is a full list that drops every product it omits, as from
+    # a backend that ignores the watermark.
+    def __init__(self, url, store):
+        self.url = url
+        self.store = store
+        self.session = requests.Session()  # Keep-alive across refreshes
+
+    def fetch(self):
+        headers = {}
+        params = {}
+        etag = self.store.get_meta('etag')
+        last_modified = self.store.get_meta('last_modified')
+        watermark = self.store.get_meta('watermark')
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        if watermark:
+            params['updatedSince'] = watermark
+
+        response = self.session.get(self.url, headers=headers, params=params, timeout=REQUEST_TIMEOUT)
+        if response.status_code == 304:
+            return None, {}
+        if response.status_code != 200:
+            raise CatalogError(f"Failed to load products. Server returned: {response.status_code}")
+
+        is_delta = response.headers.get('X-Catalog-Delta', '').lower() in ('1', 'true')
+        meta = {}
+        if response.headers.get('ETag'):
+            meta['etag'] = response.headers['ETag']
+        if response.headers.get('Last-Modified'):
+            meta['last_modified'] = response.headers['Last-Modified']
+        return (response.json(), is_delta), meta
+
+    def diff(self, current, products, is_delta):
+        upserts = {}
+        removals = set()
+        for product in products:
+            uid = product['uid']
+            if product['status'] != 'active':
+                if uid in current:
+                    removals.add(uid)
+                continue
+            product = with_price_cents(product)  # Index prices as integer cents
+            if current.get(uid) != product:
+                upserts[uid] = product
+        if not is_delta:
+            # A full list drops every product it no longer mentions as active
+            active = {product['uid'] for product in products if product['status'] == 'active'}
+            removals.update(uid for uid in current if uid not in active)
+        return upserts, removals
+
+    def watermark(self, products):
+        stamps = [product['updatedAt'] for product in products if product.get('updatedAt')]
+        return max(stamps) if stamps else None
+
+    def pull(self, current):
+        result, meta = self.fetch()
+        if result is None:
+            return {}, set()
+        products, is_delta = result
+        upserts, removals = self.diff(current, products, is_delta)
+        watermark = self.watermark(products)
+        if watermark and watermark > self.store.get_meta('watermark', ''):
+            meta['watermark'] = watermark
+        self.store.apply(upserts, removals, meta)
+        return upserts, removals
+
+
+class ProductCatalog:
+    # Serves the uid -> product index from the local snapshot straight away and
+    # refreshes it from the API off the UI thread. The index is never mutated in
+    # place: a refresh builds a new dict and publishes it with one assignment.
+    def __init__(self, url, path=CATALOG_DB):
+        self.url = url
+        self.store = CatalogStore(path)
+        self.sync = CatalogSync(url, self.store)
+        self.products = self.store.load()
+        self.last_changes = (0, 0)  # (added or changed, removed) by the last refresh
+        if not self.products:
+            # Nothing to diff against, so the next sync must be a full download
+            self.store.apply({}, (), {'etag': '', 'last_modified': '', 'watermark': ''})
+
+    def refresh(self):
+        upserts, removals = self.sync.pull(self.products)
+        self.last_changes = (len(upserts), len(removals))
+        if upserts or removals:
+            products = dict(self.products)
+            products.update(upserts)
+            for uid in removals:
+                products.pop(uid, None)
+            self.products = products
+        return self.products
+
+
+
+class CatalogRefresher:
+    # Re-syncs the catalog on a daemon thread every `interval` seconds so price and
+    # status changes reach the kiosk without a restart. The first sync runs at once.
+    def __init__(self, catalog, interval=REFRESH_INTERVAL, on_done=None, on_error=None):
+        self.catalog = catalog
+        self.interval = interval
+        self.on_done = on_done
+        self.on_error = on_error
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.metrics = {
+            'refreshes': 0,
+            'failures': 0,
+            'last_duration': None,  # Seconds taken by the last sync
+            'last_refresh': None,  # time.time() of the last successful sync
+            'products': len(catalog.products),
+            'changed': 0,
+            'removed': 0,
+        }
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.refresh_once()
+            self.stop_event.wait(self.interval)
+
+    def refresh_once(self):
+        started = time.monotonic()
+        try:
+            products = self.catalog.refresh()
+        except Exception as e:
+            self.metrics['failures'] += 1
+            self.metrics['last_duration'] = time.monotonic() - started
+            if self.on_error:
+                self.on_error(e)
+            return None
+
+        changed, removed = self.catalog.last_changes
+        self.metrics.update(
+            refreshes=self.metrics['refreshes'] + 1,
+            last_duration=time.monotonic() - started,
+            last_refresh=time.time(),
+            products=len(products),
+            changed=changed,
+            removed=removed,
+        )
+        if self.on_done:
+            self.on_done(products)
+        return products
@@ -5,19 +5,26 @@ import customtkinter as ctk
 from tkinter import messagebox, StringVar
 from tkinter import ttk
 import tkinter as tk
-from PIL import Image, ImageTk
 import qrcode
 import json
 import requests
-import time
-import RPi.GPIO as GPIO
-from mfrc522 import SimpleMFRC522
 import pygame
+from photo_cache import photo_cache
+from animation import AnimationManager, animation_cache
+from catalog import ProductCatalog, CatalogRefresher, CatalogError
+from rfid import open_readers, ReaderManager
+from cart import Cart, line_name, line_total
+from money import format_money, to_amount
+from ui_dispatch import UIDispatcher, RedrawScheduler
+from cart_view import VirtualList
+from screens import ScreenManager
 
 # Configure CustomTkinter appearance and color theme
 ctk.set_appearance_mode("Light")
 ctk.set_default_color_theme("blue")
 
+CART_ROW_HEIGHT = 60  # Pixels per cart row, including the gap below it
+
 class SelfCheckoutSystem(ctk.CTk):
     def _init_(self):
         super()._init_()
@@ -33,7 +40,14 @@ class SelfCheckoutSystem(ctk.CTk):
         screen_height = self.winfo_screenheight()
         self.geometry(f"{screen_width}x{screen_height}+0+0")
         self.configure(bg="#F6F7FB")
-        self.products = self.load_active_products()
+        self.ui = UIDispatcher(self)  # Worker threads hand Tk work to the main loop through this
+        self.cart_redraw = RedrawScheduler(self, self.update_cart_display)  # At most one cart redraw per frame
+        self.catalog = ProductCatalog(
+            "https://iibiye.up.railway.app/api/products/data/getwithstatus"
+        )
+        # Local snapshot, available without waiting for the API
+        self.products = self.catalog.products
+        self.load_active_products()
         try:
             pygame.mixer.init()
         except pygame.error:
@@ -45,74 +59,65 @@ class SelfCheckoutSystem(ctk.CTk):
         self.scanqrcode = pygame.mixer.Sound("scanqrcode.wav")
         self.warning_sound = pygame.mixer.Sound("timerend.wav")
 
-        self.reader = SimpleMFRC522()
-        GPIO.setwarnings(False)  # Disable GPIO warnings
-        self.cart = []  # Initialize the cart
-        self.cart_items = []  # To store cart item widgets
+        self.readers = open_readers()  # MFRC522s, or trace replays when RFID_TRACE is set
+        self.cart = Cart()  # Scanned products by UID, with a running total
+        self.cart.subscribe(lambda event, product: self.cart_redraw.mark_dirty())
         self.total_price = StringVar()  # State management for total price
-        self.widgets_to_clear = []
-        self.rfid_thread_running = True  # Flag to control RFID reading
+        self.rfid_readers = None  # Polls the readers while the cart is open
         self.timer_running = False
+        self.animations = AnimationManager(self)  # Owns every GIF loop on screen
+        self.screens = ScreenManager(self, self.animations)  # Each screen is built once, then shown and hidden
+        self.screens.add("start", self.build_start_screen)
+        self.screens.add("cart", self.build_cart_screen, self.update_cart_display)
+        self.screens.add("qr", self.build_qr_screen, self.refresh_qr_code)
+        self.screens.add("payment", self.build_payment_screen, lambda: self.phone_number_var.set(""))
+        self.screens.add("loading", self.build_loading_screen)
         self.start_screen()
 
     def exit_fullscreen(self, event=None):
         self.attributes('-fullscreen', False)
 
     def load_active_products(self):
-        # Load all active products from the API
-        try:
-            url = "https://iibiye.up.railway.app/api/products/data/getwithstatus"
-            response = requests.get(url)
-            if response.status_code == 200:
-                products = response.json()
-                active_products = {
-                    product["uid"]: product
-                    for product in products
-                    if product["status"] == "active"
-                }
-                return active_products
-            else:
-                messagebox.showerror(
-                    "Error",
-                    f"Failed to load products. Server returned: {response.status_code}",
-                )
-                return {}
-        except Exception as e:
-            messagebox.showerror(
-                "Error", f"An error occurred while loading products: {e}"
-            )
-            return {}
-
-    def clear_window(self):
-        for widget in self.widgets_to_clear:
-            try:
-                if widget.winfo_exists():
-                    widget.destroy()
-            except Exception as e:
-                print(f"Error while destroying widget: {e}")
-        self.widgets_to_clear.clear()
-
-    def fetch_product_info(self, uid):
-        uid_str = str(uid)  # Convert UID to string
-        print(f"Reading UID: {uid_str}")
-        print(f"Available UIDs: {self.products.keys()}")
-        if uid_str in self.products:
-            product = self.products[uid_str]
-            self.add_product_to_cart(product)
+        # Keep the local catalog in sync with the API in the background
+        self.catalog_refresher = CatalogRefresher(
+            self.catalog, on_done=self.set_products, on_error=self.on_catalog_error
+        )
+        self.catalog_refresher.start()
+
+    def set_products(self, products):
+        # Single reference swap, readers never see a half-built index
+        self.products = products
+
+    def on_catalog_error(self, error):
+        if self.products:
+            print(f"Catalog refresh failed, using local snapshot: {error}")
+            return
+        if isinstance(error, CatalogError):
+            message = str(error)
         else:
+            message = f"An error occurred while loading products: {error}"
+        self.ui.post(messagebox.showerror, "Error", message)
+
+    def fetch_product_info(self, uids):
+        print(f"Reading UIDs: {uids}")
+        # Read the index once, a background refresh may swap it at any time
+        products = self.products
+        print(f"Available UIDs: {len(products)}")
+        found = [products[str(uid)] for uid in uids if str(uid) in products]
+        self.add_products_to_cart(found)
+        if len(found) < len(uids):
             messagebox.showerror("Error", "Product not found.")
 
     def start_screen(self):
-        self.clear_window()
+        self.screens.show("start")
+
+    def build_start_screen(self):
         full_screen_frame = ctk.CTkFrame(self, fg_color="#F6F7FB", corner_radius=0)
-        full_screen_frame.pack(expand=True, fill="both")
-        self.widgets_to_clear.append(full_screen_frame)
 
         center_frame = ctk.CTkFrame(
             full_screen_frame, fg_color="#F6F7FB", corner_radius=10
         )
         center_frame.pack(expand=True, padx=20, pady=20)
-        self.widgets_to_clear.append(center_frame)
 
         prompt_label = ctk.CTkLabel(
             center_frame,
@@ -122,11 +127,9 @@ class SelfCheckoutSystem(ctk.CTk):
             text_color="black",
         )
         prompt_label.pack(pady=10)
-        self.widgets_to_clear.append(prompt_label)
 
         gif_label = tk.Label(center_frame, bg="#F6F7FB")
         gif_label.pack(pady=10)
-        self.widgets_to_clear.append(gif_label)
         self.animate_gif(gif_label, "start.gif")
 
         scan_button = ctk.CTkButton(
@@ -139,81 +142,51 @@ class SelfCheckoutSystem(ctk.CTk):
             hover_color="#C10000",
         )
         scan_button.pack(pady=10)
-        self.widgets_to_clear.append(scan_button)
+        return full_screen_frame
 
     def display_rfid_instructions(self):
-        self.clear_window()
         self.INSTRUCsound.play()
         self.display_cart()
-        instruction_label = ctk.CTkLabel(
-            self,
-            text="Place the RFID tag of the product in the RFID reader",
-            font=("Arial", 14, "bold"),
-            fg_color="#F6F7FB",
-            text_color="black",
-        )
-        instruction_label.pack(pady=10)
-        self.widgets_to_clear.append(instruction_label)
         self.start_rfid_reader()
 
     def start_rfid_reader(self):
-        self.rfid_thread_running = True
-        threading.Thread(target=self.read_rfid).start()
+        print("Place your RFID tag near the reader...")
+        self.rfid_readers = ReaderManager(self.readers, self.read_rfid)
+        self.rfid_readers.start()
 
-    def read_rfid(self):
-        try:
-            print("Place your RFID tag near the reader...")
-            while self.rfid_thread_running:
-                id, text = self.reader.read()
-                print(f"ID: {id}")
-                print(f"Text: {text}")
-                self.sound.play()
-                self.fetch_product_info(id)
-                time.sleep(1)  # Small delay to avoid multiple reads of the same tag
-        finally:
-            GPIO.cleanup()
+    def read_rfid(self, ids):
+        # Runs on a reader thread with the tags newly presented, each once
+        print(f"IDs: {ids}")
+        self.sound.play()
+        self.ui.post(self.fetch_product_info, ids)  # Lookup and cart updates run on the Tk thread
 
     def stop_rfid_reader(self):
-        self.rfid_thread_running = False
-
-    def add_product_to_cart(self, product):
-        if any(p["uid"] == product["uid"] for p in self.cart):
-            self.display_duplicate_message()
-        else:
-            self.cart.append(product)
-            self.update_cart_display()
+        if self.rfid_readers is not None:
+            self.rfid_readers.stop()
 
-    def display_duplicate_message(self):
-        duplicate_label = ctk.CTkLabel(
-            self,
-            text="Product already in cart.",
-            font=("Arial", 20),
-            fg_color="#F6F7FB",
-            text_color="red",
-        )
-        duplicate_label.pack(pady=10)
-        self.widgets_to_clear.append(duplicate_label)
-        self.after(3000, duplicate_label.destroy)  # Remove the label after 3 seconds
+    def add_products_to_cart(self, products):
+        # A repeat scan adds one more unit to its line; a batch is one update
+        self.cart.add_many(products)
 
     def delete_item(self, uid):
         if messagebox.askyesno(
             "Confirm Delete", "Are you sure you want to delete this item?"
         ):
-            self.cart = [product for product in self.cart if product["uid"] != uid]
-            self.update_cart_display()
+            self.cart.remove(uid)
 
     def display_cart(self):
-        self.clear_window()
+        self.screens.show("cart")
 
-        container_frame = ctk.CTkFrame(self, fg_color="#F6F7FB", corner_radius=0)
+    def build_cart_screen(self):
+        screen = ctk.CTkFrame(self, fg_color="#F6F7FB", corner_radius=0)
+
+        container_frame = ctk.CTkFrame(screen, fg_color="#F6F7FB", corner_radius=0)
         container_frame.pack(expand=True, fill="both", padx=20, pady=20)
-        self.widgets_to_clear.append(container_frame)
 
         total_frame = ctk.CTkFrame(
             container_frame, fg_color="#F6F7FB", corner_radius=10
         )
         total_frame.pack(side="left", fill="y", padx=20, pady=20)
-        self.widgets_to_clear.append(total_frame)
 
         total_label = ctk.CTkLabel(
             total_frame,
@@ -223,7 +196,6 @@ class SelfCheckoutSystem(ctk.CTk):
             text_color="black",
         )
         total_label.pack(pady=10)
-        self.widgets_to_clear.append(total_label)
 
         buy_button = ctk.CTkButton(
             total_frame,
@@ -235,81 +207,81 @@ class SelfCheckoutSystem(ctk.CTk):
             font=("Arial", 16),
         )
         buy_button.pack(pady=10)
-        self.widgets_to_clear.append(buy_button)
 
         cart_frame = ctk.CTkFrame(container_frame, fg_color="#F6F7FB", corner_radius=0)
         cart_frame.pack(side="right", expand=True, fill="both", padx=20, pady=20)
-        self.widgets_to_clear.append(cart_frame)
 
         self.cart_display = tk.Canvas(cart_frame, bg="#F6F7FB")
         self.cart_display.pack(side="left", fill="both", expand=True)
-        self.widgets_to_clear.append(self.cart_display)
 
         scrollbar = ttk.Scrollbar(
             cart_frame, orient="vertical", command=self.cart_display.yview
         )
         scrollbar.pack(side="right", fill="y")
-        self.cart_display.configure(yscrollcommand=scrollbar.set)
-        self.cart_window = ttk.Frame(self.cart_display)
-        self.cart_display.create_window((0, 0), window=self.cart_window, anchor="nw")
-        self.cart_window.bind(
-            "<Configure>",
-            lambda e: self.cart_display.configure(
-                scrollregion=self.cart_display.bbox("all")
-            ),
+        # Only the rows in view exist; they are refilled as the cart scrolls
+        self.cart_list = VirtualList(
+            self.cart_display,
+            CART_ROW_HEIGHT,
+            self.create_cart_row,
+            self.show_cart_row,
+            scrollbar=scrollbar,
         )
 
-        self.update_cart_display()
+        instruction_label = ctk.CTkLabel(
+            screen,
+            text="Place the RFID tag of the product in the RFID reader",
+            font=("Arial", 14, "bold"),
+            fg_color="#F6F7FB",
+            text_color="black",
+        )
+        instruction_label.pack(pady=10)
+        return screen
 
     def update_cart_display(self):
-        for widget in self.cart_items:
-            try:
-                if widget.winfo_exists():
-                    widget.destroy()
-            except tk.TclError:
-                pass
-        self.cart_items.clear()
-
-        for product in self.cart:
-            row_frame = ctk.CTkFrame(
-                self.cart_window, fg_color="#F6F7FB", corner_radius=0
-            )
-            row_frame.pack(fill="both", expand=True, pady=10, padx=10)
-            self.cart_items.append(row_frame)
-
-            name_label = ctk.CTkLabel(
-                row_frame,
-                text=product["name"],
-                font=("Arial", 16),
-                fg_color="#F6F7FB",
-                text_color="black",
-            )
-            name_label.pack(side="left", padx=30)
-            self.cart_items.append(name_label)
-
-            delete_button = ctk.CTkButton(
-                row_frame,
-                text="Delete",
-                command=lambda uid=product["uid"]: self.delete_item(uid),
-                fg_color="#F40000",
-                hover_color="#C10000",
-                text_color="white",
-            )
-            delete_button.pack(side="right", padx=30)
-            self.cart_items.append(delete_button)
-
-            price_label = ctk.CTkLabel(
-                row_frame,
-                text=f"${product['sellingPrice']:0.3f}",
-                font=("Arial", 16),
-                fg_color="#F6F7FB",
-                text_color="black",
-            )
-            price_label.pack(side="right", padx=30)
-            self.cart_items.append(price_label)
+        self.cart_list.set_items(self.cart.products())
+        self.update_total()
+
+    def update_total(self):
+        self.total_price.set(f"Total Price: {format_money(self.cart.total)}")
+
+    def create_cart_row(self, parent):
+        row = {}
+        row_frame = ctk.CTkFrame(parent, fg_color="#F6F7FB", corner_radius=0)
+
+        name_label = ctk.CTkLabel(
+            row_frame,
+            text="",
+            font=("Arial", 16),
+            fg_color="#F6F7FB",
+            text_color="black",
+        )
+        name_label.pack(side="left", padx=30)
+
+        delete_button = ctk.CTkButton(
+            row_frame,
+            text="Delete",
+            command=lambda: self.delete_item(row["uid"]),
+            fg_color="#F40000",
+            hover_color="#C10000",
+            text_color="white",
+        )
+        delete_button.pack(side="right", padx=30)
 
-        total_price = sum(product["sellingPrice"] for product in self.cart)
-        self.total_price.set(f"Total Price: ${total_price:.3f}")
+        price_label = ctk.CTkLabel(
+            row_frame,
+            text="",
+            font=("Arial", 16),
+            fg_color="#F6F7FB",
+            text_color="black",
+        )
+        price_label.pack(side="right", padx=30)
+        row.update(frame=row_frame, name=name_label, price=price_label, uid=None)
+        return row
+
+    def show_cart_row(self, row, product, index):
+        row["uid"] = product["uid"]
+        row["name"].configure(text=line_name(product))
+        row["price"].configure(text=format_money(line_total(product)))
 
     def confirm_purchase(self):
         if not self.cart:
@@ -328,8 +300,8 @@ class SelfCheckoutSystem(ctk.CTk):
 
     def generate_qr_code(self):
         product_data = {
-            "uid": [product["uid"] for product in self.cart],
-            "total": f"${sum(product['sellingPrice'] for product in self.cart):.2f}",
+            "items": self.cart.quantities(),  # [uid, quantity] pairs
+            "total": format_money(self.cart.total),
         }
         qr_info = json.dumps(product_data)
         qr = qrcode.QRCode(
@@ -344,41 +316,27 @@ class SelfCheckoutSystem(ctk.CTk):
         img.save("payment_qr.png")  # Save to a known location
 
     def animate_gif(self, label, gif_file):
-        gif = Image.open(gif_file)
-        self.gif_frames = []
-        try:
-            for frame_num in range(gif.n_frames):
-                gif.seek(frame_num)
-                resized_frame = gif.copy().resize((250, 250), Image.Resampling.LANCZOS)
-                frame_image = ImageTk.PhotoImage(resized_frame)
-                self.gif_frames.append(frame_image)
-        except EOFError:
-            pass
-        self.gif_index = 0
-        self.update_scan(label)
-
-    def update_scan(self, label):
-        if self.gif_frames:
-            frame = self.gif_frames[self.gif_index]
-            label.config(image=frame)
-            self.gif_index = (self.gif_index + 1) % len(self.gif_frames)
-            label.after(20, self.update_scan, label)
+        # Frames are decoded on a worker thread, playback starts with the first
+        stream = animation_cache.stream(gif_file, (250, 250))
+        self.animations.play(label, stream)
 
     def display_qr_code(self):
-        self.clear_window()
         self.scanqrcode.play()
-        qr_frame = ctk.CTkFrame(self, fg_color="#F6F7FB", corner_radius=0)
-        qr_frame.pack(expand=True, fill="both")
-        self.widgets_to_clear.append(qr_frame)
+        self.screens.show("qr")
+        self.start_timer(90)
 
-        qr_image_pil = Image.open("payment_qr.png")
-        qr_photo = ImageTk.PhotoImage(
-            qr_image_pil.resize((300, 300), Image.Resampling.LANCZOS)
+    def refresh_qr_code(self):
+        qr_photo = photo_cache.load_file(
+            "payment_qr.png", (300, 300)
         )  # Adjust size as needed
-        qr_label = tk.Label(qr_frame, image=qr_photo, bg="#F6F7FB")
-        qr_label.image = qr_photo
-        qr_label.pack(pady=20)
-        self.widgets_to_clear.append(qr_label)
+        self.qr_label.configure(image=qr_photo)
+        self.qr_label.image = qr_photo
+
+    def build_qr_screen(self):
+        qr_frame = ctk.CTkFrame(self, fg_color="#F6F7FB", corner_radius=0)
+
+        self.qr_label = tk.Label(qr_frame, bg="#F6F7FB")
+        self.qr_label.pack(pady=20)
 
         instruction_label = ctk.CTkLabel(
             qr_frame,
@@ -389,7 +347,6 @@ class SelfCheckoutSystem(ctk.CTk):
             wraplength=400,
         )
         instruction_label.pack(pady=10)
-        self.widgets_to_clear.append(instruction_label)
 
         self.timer_label = ctk.CTkLabel(
             qr_frame,
@@ -399,7 +356,6 @@ class SelfCheckoutSystem(ctk.CTk):
             text_color="#F40000",
         )
         self.timer_label.pack(pady=10)
-        self.widgets_to_clear.append(self.timer_label)
 
         # Add "I don't have a smartphone" button
         no_smartphone_button = ctk.CTkButton(
@@ -412,7 +368,6 @@ class SelfCheckoutSystem(ctk.CTk):
             font=("Arial", 16),
         )
         no_smartphone_button.pack(pady=10)
-        self.widgets_to_clear.append(no_smartphone_button)
 
         # Add "Complete" button with confirmation dialog
         complete_button = ctk.CTkButton(
@@ -425,9 +380,7 @@ class SelfCheckoutSystem(ctk.CTk):
             font=("Arial", 16),
         )
         complete_button.pack(pady=10)
-        self.widgets_to_clear.append(complete_button)
-
-        self.start_timer(90)
+        return qr_frame
 
     def complete_transaction(self):
         response = messagebox.askyesno(
@@ -438,10 +391,11 @@ class SelfCheckoutSystem(ctk.CTk):
             self.restart_application()
 
     def payment_method_screen(self):
-        self.clear_window()
+        self.timer_running = False  # The QR countdown only runs while the QR is shown
+        self.screens.show("payment")
+
+    def build_payment_screen(self):
         payment_frame = ctk.CTkFrame(self, fg_color="#F6F7FB", corner_radius=0)
-        payment_frame.pack(expand=True, fill="both")
-        self.widgets_to_clear.append(payment_frame)
 
         payment_label = ctk.CTkLabel(
             payment_frame,
@@ -451,7 +405,6 @@ class SelfCheckoutSystem(ctk.CTk):
             text_color="black",
         )
         payment_label.pack(pady=20)
-        self.widgets_to_clear.append(payment_label)
 
         self.phone_number_var = StringVar()
         phone_number_entry = ctk.CTkEntry(
@@ -469,7 +422,6 @@ class SelfCheckoutSystem(ctk.CTk):
             height=30,
         )
         phone_number_entry.pack(pady=20, padx=30)
-        self.widgets_to_clear.append(phone_number_entry)
 
         make_payment_button = ctk.CTkButton(
             payment_frame,
@@ -481,7 +433,7 @@ class SelfCheckoutSystem(ctk.CTk):
             font=("Arial", 16),
         )
         make_payment_button.pack(pady=20)
-        self.widgets_to_clear.append(make_payment_button)
+        return payment_frame
 
     def make_payment(self):
         phone_number = self.phone_number_var.get()
@@ -493,16 +445,14 @@ class SelfCheckoutSystem(ctk.CTk):
         threading.Thread(target=self.process_transaction, args=(phone_number,)).start()
 
     def show_loading_screen(self):
-        self.clear_window()
+        self.screens.show("loading")
 
+    def build_loading_screen(self):
         full_screen_frame = ctk.CTkFrame(self, fg_color="#F6F7FB", corner_radius=0)
-        full_screen_frame.pack(expand=True, fill="both")
-        self.widgets_to_clear.append(full_screen_frame)
         center_frame = ctk.CTkFrame(
             full_screen_frame, fg_color="#F6F7FB", corner_radius=10
         )
         center_frame.pack(expand=True, padx=20, pady=20)
-        self.widgets_to_clear.append(center_frame)
 
         loading_label = ctk.CTkLabel(
             center_frame,
@@ -512,15 +462,13 @@ class SelfCheckoutSystem(ctk.CTk):
             text_color="black",
         )
         loading_label.pack(pady=20)
-        self.widgets_to_clear.append(loading_label)
 
         gif_label = tk.Label(center_frame, bg="#F6F7FB")
         gif_label.pack(pady=10)
-        self.widgets_to_clear.append(gif_label)
         self.animate_gif(gif_label, "circular_loading1.gif")
+        return full_screen_frame
 
     def close_loading_screen(self):
-        self.clear_window()
         self.payment_method_screen()
 
     def process_transaction(self, phone_number):
@@ -530,9 +478,11 @@ class SelfCheckoutSystem(ctk.CTk):
             for product in self.cart:
                 try:
                     product_uid = product["_id"]  # Ensure productUid is a string
-                    products_list.append({"productUid": product_uid})
+                    products_list.append(
+                        {"productUid": product_uid, "qty": product["quantity"]}
+                    )
                 except Exception as e:
-                    messagebox.showerror("Error", f"Invalid product UID format: {e}")
+                    self.ui.post(messagebox.showerror, "Error", f"Invalid product UID format: {e}")
                     return
              
             product_data = {
@@ -540,7 +490,7 @@ class SelfCheckoutSystem(ctk.CTk):
                 "productsList": products_list,
                 "paymentMethod": "EVC-PLUS",
                 "paymentPhone": phone_number,
-                "totalPrice": sum(product["sellingPrice"] for product in self.cart),
+                "totalPrice": to_amount(self.cart.total),
             }
 
             # Send the transaction request to the server
@@ -549,21 +499,23 @@ class SelfCheckoutSystem(ctk.CTk):
                 "https://iibiye.up.railway.app/api/transactions", json=product_data
             )
 
+            # This runs on a worker thread, so every screen change and dialog
+            # is posted to the Tk thread, where they run in this order
             if response.status_code == 201:
-                self.close_loading_screen()
-                messagebox.showinfo("Success", "Transaction successful.")
-                self.restart_application()
+                self.ui.post(self.close_loading_screen)
+                self.ui.post(messagebox.showinfo, "Success", "Transaction successful.")
+                self.ui.post(self.restart_application)
             else:
-                self.close_loading_screen()
+                self.ui.post(self.close_loading_screen)
                 error_message = response.json().get("message", "Unknown error")
-                messagebox.showerror("Error", f"Transaction failed: {error_message}")
-                self.payment_method_screen()
+                self.ui.post(messagebox.showerror, "Error", f"Transaction failed: {error_message}")
+                self.ui.post(self.payment_method_screen)
         except requests.exceptions.RequestException as e:
-            messagebox.showerror("Error", f"Network error occurred: {e}")
-            self.payment_method_screen()
+            self.ui.post(messagebox.showerror, "Error", f"Network error occurred: {e}")
+            self.ui.post(self.payment_method_screen)
         except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {e}")
-            self.payment_method_screen()
+            self.ui.post(messagebox.showerror, "Error", f"An error occurred: {e}")
+            self.ui.post(self.payment_method_screen)
 
     def start_timer(self, duration):
         self.time_remaining = duration
@@ -588,7 +540,8 @@ class SelfCheckoutSystem(ctk.CTk):
 
     def restart_application(self):
         self.timer_running = False
-        self.clear_window()
+        self.catalog_refresher.stop()
+        self.catalog.store.close()
         self.destroy()
         os.execl(sys.executable, sys.executable, *sys.argv)
 
@@ -0,0 +1,91 @@
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from PIL import Image, ImageTk
+
+from photo_cache import photo_cache
+from thumbnail_cache import THUMBNAIL_SIZE, ThumbnailCache, image_url, make_thumbnail
+
+MAX_WORKERS = 4
+REQUEST_TIMEOUT = 15
+
+
+class ImageLoader:
+    # Loads product thumbnails on a small thread pool that shares one keep-alive
+    # HTTP session. Finished images are posted to the window's UIDispatcher and
+    # handed to their callbacks on the Tk thread, so callbacks may touch widgets.
+    def __init__(self, ui, base_url, cache=None, photos=photo_cache, max_workers=MAX_WORKERS):
+        self.ui = ui
+        self.base_url = base_url
+        self.cache = cache or ThumbnailCache()
+        self.photos = photos
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-loader")
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.lock = threading.Lock()
+        self.pending = {}  # (img_path, size) -> Future, so each image is fetched once
+        self.placeholder = ImageTk.PhotoImage(Image.new("RGB", THUMBNAIL_SIZE, "#E4E6EE"))
+
+    def fetch(self, img_path, size):
+        image = self.cache.get(img_path, size)
+        if image is None:
+            response = self.session.get(image_url(self.base_url, img_path), timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            image = make_thumbnail(io.BytesIO(response.content), size)
+            self.cache.put(img_path, image, size)
+        return image
+
+    def prefetch(self, img_path, size=THUMBNAIL_SIZE):
+        # Safe to call from any thread, e.g. as soon as a tag is scanned
+        key = (img_path, size)
+        with self.lock:
+            future = self.pending.get(key)
+            if future is None:
+                future = self.executor.submit(self.fetch, img_path, size)
+                self.pending[key] = future
+                future.add_done_callback(lambda f, key=key: self.forget(key))
+        return future
+
+    def forget(self, key):
+        with self.lock:
+            self.pending.pop(key, None)
+
+    def request(self, img_path, callback, size=THUMBNAIL_SIZE):
+        # callback(pil_image) runs on the Tk thread once the image is ready
+        future = self.prefetch(img_path, size)
+        future.add_done_callback(lambda f: self.ui.post(self.deliver, callback, img_path, f))
+
+    def show(self, label, img_path, size=THUMBNAIL_SIZE):
+        # Put the thumbnail on a label: straight from the photo cache when it was
+        # shown before, otherwise the placeholder until the download finishes
+        photo = self.photos.get(img_path, size)
+        if photo is not None:
+            label.configure(image=photo)
+            label.image = photo
+            return
+
+        def on_ready(pil_image):
+            photo = self.photos.put(img_path, size, pil_image)
+            if label.winfo_exists():
+                label.configure(image=photo)
+                label.image = photo  # Keep a reference past cache eviction
+
+        label.configure(image=self.placeholder)
+        self.request(img_path, on_ready, size)
+
+    def deliver(self, callback, img_path, future):
+        error = future.exception()
+        if error is not None:
+            print(f"Failed to load image {img_path}: {error}")
+            return
+        try:
+            callback(future.result())
+        except Exception as e:
+            print(f"Error while showing image {img_path}: {e}")
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,156 @@
+import io
+import math
+
+from PIL import Image
+
+try:
+    from lottie.objects.assets import Image as ImageAsset
+    from lottie.objects.layers import ImageLayer, NullLayer
+    from lottie.parsers.tgs import parse_tgs
+    from lottie.utils.transform import TransformMatrix
+    from lottie.exporters import cairo as lottie_cairo
+except ImportError:
+    parse_tgs = None
+
+# Frames rendered at most. A longer animation is sampled at a lower frame rate,
+# since every frame is held as a full-size Tk image: check_start.json's 64
+# frames at 850x850 would take 185MB, against 101MB for its 35-frame GIF.
+MAX_FRAMES = 32
+
+
+def can_render(json_file):
+    # Image/null layer animations are composited here with PIL; anything else
+    # needs the lottie package's cairo exporter, which requires cairosvg
+    if parse_tgs is None:
+        return False
+    try:
+        animation = parse_tgs(json_file)
+    except (OSError, ValueError) as e:
+        print(f"Could not read {json_file}: {e}")
+        return False
+    return only_image_layers(animation) or hasattr(lottie_cairo, 'export_png')
+
+
+def only_image_layers(animation):
+    return all(isinstance(layer, (ImageLayer, NullLayer)) for layer in animation.layers)
+
+
+def value_at(prop, time):
+    # lottie's get_value falls back to the first keyframe past the last one when
+    # keyframes have no explicit end value (as in files from current exporters),
+    # so hold the last keyframe instead
+    if prop.animated and prop.keyframes:
+        time = max(prop.keyframes[0].time, min(time, prop.keyframes[-1].time))
+    return prop.get_value(time)
+
+
+def transform_matrix(transform, time):
+    # Same composition order as lottie's Transform.to_matrix, with value_at
+    matrix = TransformMatrix()
+    if transform.anchor_point:
+        anchor = value_at(transform.anchor_point, time)
+        matrix.translate(-anchor[0], -anchor[1])
+    if transform.scale:
+        scale = value_at(transform.scale, time)
+        matrix.scale(scale[0] / 100, scale[1] / 100)
+    skew = value_at(transform.skew, time) if transform.skew else 0
+    if skew:
+        axis = value_at(transform.skew_axis, time) if transform.skew_axis else 0
+        matrix.skew_from_axis(-math.radians(skew), math.radians(axis))
+    rotation = value_at(transform.rotation, time) if transform.rotation else 0
+    if rotation:
+        matrix.rotate(-math.radians(rotation))
+    if transform.position:
+        position = value_at(transform.position, time)
+        matrix.translate(position[0], position[1])
+    return matrix
+
+
+def layer_matrix(layer, frame_no):
+    # Composition-space transform of a layer, including its parent chain
+    matrix = transform_matrix(layer.transform, frame_no - (layer.start_time or 0))
+    parent = layer.parent
+    while parent is not None:
+        matrix = matrix * transform_matrix(parent.transform, frame_no - (parent.start_time or 0))
+        parent = parent.parent
+    return matrix
+
+
+def paste_transformed(canvas, image, matrix, opacity):
+    # Draw `image` under the affine `matrix` (x' = a*x + c*y + tx, y' = b*x + d*y + ty),
+    # resampling only the canvas area it covers
+    a, b, c, d, tx, ty = matrix.a, matrix.b, matrix.c, matrix.d, matrix.tx, matrix.ty
+    det = a * d - b * c
+    if abs(det) < 1e-9 or opacity <= 0:
+        return
+    w, h = image.size
+    xs = [a * x + c * y + tx for x, y in ((0, 0), (w, 0), (0, h), (w, h))]
+    ys = [b * x + d * y + ty for x, y in ((0, 0), (w, 0), (0, h), (w, h))]
+    left = max(0, math.floor(min(xs)))
+    top = max(0, math.floor(min(ys)))
+    right = min(canvas.width, math.ceil(max(xs)))
+    bottom = min(canvas.height, math.ceil(max(ys)))
+    if right <= left or bottom <= top:
+        return
+
+    # PIL wants the inverse mapping, from patch pixels back to image pixels
+    ox, oy = left - tx, top - ty
+    inverse = (d / det, -c / det, (d * ox - c * oy) / det, -b / det, a / det, (a * oy - b * ox) / det)
+    patch = image.transform((right - left, bottom - top), Image.Transform.AFFINE, inverse, Image.Resampling.BICUBIC)
+    if opacity < 1:
+        patch.putalpha(patch.getchannel('A').point(lambda v: round(v * opacity)))
+    canvas.alpha_composite(patch, (left, top))
+
+
+def iter_composited_frames(animation, size, frame_numbers):
+    images = {}
+    for asset in animation.assets:
+        if isinstance(asset, ImageAsset):
+            _, data = asset.data()
+            if data:
+                image = Image.open(io.BytesIO(data)).convert('RGBA')
+                # The embedded bitmap may be larger than the asset's declared size;
+                # keep its pixels and fold the difference into the transform
+                fit = TransformMatrix().scale(asset.width / image.width, asset.height / image.height)
+                images[asset.id] = (image, fit)
+
+    scale_x = size[0] / animation.width
+    scale_y = size[1] / animation.height
+    layers = [layer for layer in reversed(animation.layers) if isinstance(layer, ImageLayer) and not layer.hidden]
+    for frame_no in frame_numbers:
+        canvas = Image.new('RGBA', size, (0, 0, 0, 0))
+        for layer in layers:
+            if layer.image_id not in images or not layer.in_point <= frame_no < layer.out_point:
+                continue
+            image, fit = images[layer.image_id]
+            matrix = (fit * layer_matrix(layer, frame_no)).scale(scale_x, scale_y)
+            opacity = value_at(layer.transform.opacity, frame_no) / 100 if layer.transform.opacity else 1
+            paste_transformed(canvas, image, matrix, opacity)
+        yield canvas
+
+
+def iter_cairo_frames(animation, size, frame_numbers):
+    # Render through the vector exporter at enough DPI to cover `size`, then fit exactly
+    dpi = 96 * max(size[0] / animation.width, size[1] / animation.height)
+    for frame_no in frame_numbers:
+        png = io.BytesIO()
+        lottie_cairo.export_png(animation, png, frame_no, dpi)
+        png.seek(0)
+        with Image.open(png) as frame:
+            yield frame.convert('RGBA').resize(size, Image.Resampling.LANCZOS)
+
+
+def iter_lottie_frames(json_file, size, max_frames=MAX_FRAMES):
+    # Rasterize a Lottie file at the target size, with each frame's duration in
+    # ms: every frame, or every step-th one when there are more than max_frames
+    animation = parse_tgs(json_file)
+    first, last = int(animation.in_point), int(animation.out_point)
+    step = max(1, math.ceil((last - first) / max_frames))
+    frame_numbers = range(first, last, step)
+    duration = round(1000 * step / animation.frame_rate)
+    if only_image_layers(animation):
+        frames = iter_composited_frames(animation, size, frame_numbers)
+    else:
+        frames = iter_cairo_frames(animation, size, frame_numbers)
+    for frame in frames:
+        yield frame, duration
@@ -1,14 +1,19 @@
 import customtkinter as ctk
 from tkinter import messagebox, ttk
 import tkinter as tk
-from PIL import Image, ImageTk
 
 from customtkinter import CTkImage
 import qrcode
 import json
 import requests
 import threading
-import urllib.request
+from image_loader import ImageLoader
+from photo_cache import photo_cache
+from animation import AnimationManager, animation_cache
+from ui_dispatch import UIDispatcher
+from cart_view import CartRows
+from screens import ScreenManager
+from money import format_money, to_cents
 
 # Configure CustomTkinter appearance and color theme
 ctk.set_appearance_mode("Light")  # Set appearance mode to "Light"
@@ -52,25 +57,34 @@ class SelfCheckoutSystem(ctk.CTk):
     #     ]
        self.products = []
        self.scanned_products = []
+       self.ui = UIDispatcher(self)  # Worker threads hand Tk work to the main loop through this
+       self.image_loader = ImageLoader(self.ui, "https://retailflash.up.railway.app/")  # Cart thumbnails, fetched off the Tk thread
        self.uid_products = [
            '1046189185985'
        ]
 
+       self.animations = AnimationManager(self)  # Owns every GIF loop on screen
+       self.screens = ScreenManager(self, self.animations)  # Each screen is built once, then shown and hidden
+       self.screens.add('start', self.build_start_screen)
+       self.screens.add('loading', self.build_loading_screen)
+       self.screens.add('cart', self.build_cart_screen, self.update_cart_display)
+       self.screens.add('qr', self.build_qr_screen, self.refresh_qr_code)
        self.start_screen()
-    
-    def clear_window(self):
-        for widget in self.winfo_children():
-            widget.destroy()
+
     def display_loading(self):
+        self.screens.show('loading')
+
+    def build_loading_screen(self):
         # loading_label = ctk.CTkLabel(self, text="Loading...", font=("Arial", 20), fg_color="#F6F7FB", text_color="black")
         # loading_label.pack(expand=True)
+        loading_frame = tk.Frame(self)
 
-        gif_label = tk.Label(self)
+        gif_label = tk.Label(loading_frame)
         gif_label.pack(expand=True)
         self.animate_gif(gif_label, "circular_loading1.gif")
+        return loading_frame
 
     def fetch_product_info(self, uids):
-        self.clear_window()
         self.display_loading()
 
         def fetch_data():
@@ -79,44 +93,27 @@ class SelfCheckoutSystem(ctk.CTk):
                 response = requests.get(url, params={'uids': uids})
                 if response.status_code == 200:
                     self.products = response.json()
-                    self.display_cart()
+                    for product in self.products:
+                        self.image_loader.prefetch(product['image'])  # Start downloads before the rows exist
+                    self.ui.post(self.display_cart)
                 else:
-                    self.clear_window()
-                    messagebox.showerror("Error", f"Failed to fetch product info. Server returned: {response.status_code}")
+                    self.ui.post(self.start_screen)
+                    self.ui.post(messagebox.showerror, "Error", f"Failed to fetch product info. Server returned: {response.status_code}")
             except Exception as e:
-                self.clear_window()
-                messagebox.showerror("Error", f"An error occurred while fetching product info: {e}")
+                self.ui.post(self.start_screen)
+                self.ui.post(messagebox.showerror, "Error", f"An error occurred while fetching product info: {e}")
 
         threading.Thread(target=fetch_data).start()
     
-    def animate_gif(self, label, gif_file):
-        gif = Image.open(gif_file)
-        self.gif_frames = []  # Initialize the list to hold the frames
-        try:
-            for frame_num in range(gif.n_frames):
-                gif.seek(frame_num)
-                # Resize the current frame. Adjust (width, height) as needed.
-                # Use Image.Resampling.LANCZOS for high-quality downsampling
-                resized_frame = gif.copy().resize((850, 850), Image.Resampling.LANCZOS)  # Resize to 150x150
-                frame_image = ImageTk.PhotoImage(resized_frame)  # Create a PhotoImage from the resized frame
-                self.gif_frames.append(frame_image)
-        except EOFError:
-            pass  # The end of the GIF file has been reached
-
-        self.gif_index = 0  # Starting index
-        self.update_gif(label)
-
-
-    def update_gif(self, label):
-        frame = self.gif_frames[self.gif_index]
-        label.config(image=frame)
-        self.gif_index = (self.gif_index + 1) % len(self.gif_frames)  # Loop the index
-        label.after(20, self.update_gif, label)  # Update every 20ms
+    def animate_gif(self, label, gif_file, fallback=None):
+        # Frames are decoded on a worker thread, playback starts with the first
+        self.animations.play(label, animation_cache.stream(gif_file, (850, 850), fallback))
 
     def start_screen(self):
-        self.clear_window()
+        self.screens.show('start')
+
+    def build_start_screen(self):
         full_screen_frame = ctk.CTkFrame(self, fg_color="#F6F7FB", corner_radius=0)
-        full_screen_frame.pack(expand=True, fill='both')
 
         # Adjust padding to ensure all elements are visible
         center_frame = ctk.CTkFrame(full_screen_frame, fg_color="#F6F7FB", corner_radius=10)
@@ -129,18 +126,15 @@ class SelfCheckoutSystem(ctk.CTk):
         # Add GIF animation
         gif_label = tk.Label(center_frame, bg="#F6F7FB")
         gif_label.pack(pady=10)
-        self.animate_gif(gif_label, "check_start.gif")
+        # Lottie rendered at the label size, the GIF where it cannot be rasterized
+        self.animate_gif(gif_label, "check_start.json", fallback="check_start.gif")
 
         # Button for starting the scan
         scan_button = ctk.CTkButton(center_frame, text="Start", command=lambda: self.fetch_product_info(self.uid_products),
                                      corner_radius=20, fg_color="#F40000",font=("Arial", 20), hover_color="#C10000")
         
         scan_button.pack(pady=10)
-
-
-
-
-    
+        return full_screen_frame
 
     def delete_item(self, uid):
         # Find and remove the product from the list
@@ -150,8 +144,11 @@ class SelfCheckoutSystem(ctk.CTk):
 
 
     def display_cart(self):
-        self.clear_window()
-        cart_frame = ctk.CTkFrame(self, fg_color="#F6F7FB", corner_radius=0)
+        self.screens.show('cart')
+
+    def build_cart_screen(self):
+        screen = ctk.CTkFrame(self, fg_color="#F6F7FB", corner_radius=0)
+        cart_frame = ctk.CTkFrame(screen, fg_color="#F6F7FB", corner_radius=0)
         cart_frame.pack(expand=True, fill='both', padx=20, pady=20)
 
         # Scrollable Canvas
@@ -189,49 +186,56 @@ class SelfCheckoutSystem(ctk.CTk):
         self.bind_all("<Button-4>", lambda event: canvas.yview_scroll(-1, "units"))  # For Linux
         self.bind_all("<Button-5>", lambda event: canvas.yview_scroll(1, "units"))  # For Linux
 
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-
-        for product in self.products:
-            row_frame = ctk.CTkFrame(scrollable_frame, fg_color="#F6F7FB", corner_radius=0)
-            row_frame.pack(fill='both', expand=True, pady=10, padx=10 )
-
-            # # Image label
-            img_path = product['image']
-            img_url = "https://retailflash.up.railway.app/" + img_path.replace('\\', '/')
-            pil_image = Image.open(urllib.request.urlopen(img_url)).resize((100, 100), Image.Resampling.LANCZOS)
-            photo = ImageTk.PhotoImage(pil_image)
-            image_label = tk.Label(row_frame, image=photo)
-            image_label.image = photo  # Keep a reference.
-            image_label.pack(side='left', padx=10, pady=30)
-            # Delete button
-            delete_button = ctk.CTkButton(row_frame, text="Delete", command=lambda uid=product['uid']: self.delete_item(uid), fg_color="#F40000", hover_color="#C10000", text_color="white")
-            delete_button.pack(side='right', padx=30)
-            # Price label
-            price_label = ctk.CTkLabel(row_frame, text=f"${product['sellingPrice']:0.3f}", font=("Arial", 16), fg_color="#F6F7FB", text_color="black")
-            price_label.pack(side='right', padx=30)
-
-            # Name label
-            name_label = ctk.CTkLabel(row_frame, text=product['name'], font=("Arial", 16), fg_color="#F6F7FB", text_color="black")
-            name_label.pack(side='left', padx=30)
-
-
-            
-
-            
+        self.scrollable_frame = scrollable_frame
+        self.cart_rows = CartRows(self.create_cart_row, self.update_cart_row)  # One row per UID
 
         # Configure canvas and scrollbar packing
         canvas.pack(side="right", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
 
         # Total price label
-        total_price = sum(p['sellingPrice'] for p in self.products)
-        total_label = ctk.CTkLabel(cart_frame, text=f"Total Price: ${total_price:.3f}", font=("Arial", 20), fg_color="#F6F7FB", text_color="black")
-        total_label.pack(padx=20, pady=200)
+        self.total_label = ctk.CTkLabel(cart_frame, text="", font=("Arial", 20), fg_color="#F6F7FB", text_color="black")
+        self.total_label.pack(padx=20, pady=200)
 
         # Buy button
         buy_button = ctk.CTkButton(cart_frame, text="Buy", command=self.confirm_purchase, corner_radius=20, fg_color="#F40000", hover_color="#C10000", font=("Arial", 16))
         buy_button.pack(padx=20)
+        return screen
+
+    def update_cart_display(self):
+        # Reconcile the rows with the fetched products; unchanged rows are left alone
+        self.cart_rows.sync(self.products)
+        self.total_cents = sum(to_cents(p['sellingPrice']) for p in self.products)  # Also used by the QR code
+        self.total_label.configure(text=f"Total Price: {format_money(self.total_cents)}")
+
+    def create_cart_row(self, product):
+        row_frame = ctk.CTkFrame(self.scrollable_frame, fg_color="#F6F7FB", corner_radius=0)
+        row_frame.pack(fill='both', expand=True, pady=10, padx=10 )
+
+        # # Image label
+        image_label = tk.Label(row_frame)
+        image_label.pack(side='left', padx=10, pady=30)
+        self.image_loader.show(image_label, product['image'])
+        # Delete button
+        delete_button = ctk.CTkButton(row_frame, text="Delete", command=lambda uid=product['uid']: self.delete_item(uid), fg_color="#F40000", hover_color="#C10000", text_color="white")
+        delete_button.pack(side='right', padx=30)
+        # Price label
+        price_label = ctk.CTkLabel(row_frame, text=format_money(to_cents(product['sellingPrice'])), font=("Arial", 16), fg_color="#F6F7FB", text_color="black")
+        price_label.pack(side='right', padx=30)
+
+        # Name label
+        name_label = ctk.CTkLabel(row_frame, text=product['name'], font=("Arial", 16), fg_color="#F6F7FB", text_color="black")
+        name_label.pack(side='left', padx=30)
+        return {'frame': row_frame, 'image': image_label, 'name': name_label, 'price': price_label}
+
+    def update_cart_row(self, row, old, product):
+        # Patch only what changed; the thumbnail is only reloaded for a new image
+        if old['image'] != product['image']:
+            self.image_loader.show(row['image'], product['image'])
+        if old['name'] != product['name']:
+            row['name'].configure(text=product['name'])
+        if old['sellingPrice'] != product['sellingPrice']:
+            row['price'].configure(text=format_money(to_cents(product['sellingPrice'])))
 
     def confirm_purchase(self):
         response = messagebox.askyesno("Confirm Purchase", "Are you sure you want to buy these items?")
@@ -246,7 +250,7 @@ class SelfCheckoutSystem(ctk.CTk):
         # Gather UIDs and total price
         product_data = {
             'products': self.products,
-            'total': f"${sum(product['sellingPrice'] for product in self.products):.2f}"
+            'total': format_money(self.total_cents)
         }
         # Convert dictionary to JSON string
         qr_info = json.dumps(product_data)
@@ -268,51 +272,34 @@ class SelfCheckoutSystem(ctk.CTk):
 
     
     def animate_scan(self, label, gif_file):
-        gif = Image.open(gif_file)
-        self.gif_frames = []  # Initialize the list to hold the frames
-        try:
-            for frame_num in range(gif.n_frames):
-                gif.seek(frame_num)
-                # Resize the current frame. Adjust (width, height) as needed.
-                # Use Image.Resampling.LANCZOS for high-quality downsampling
-                resized_frame = gif.copy().resize((850, 850), Image.Resampling.LANCZOS)  # Resize to 150x150
-                frame_image = ImageTk.PhotoImage(resized_frame)  # Create a PhotoImage from the resized frame
-                self.gif_frames.append(frame_image)
-        except EOFError:
-            pass  # The end of the GIF file has been reached
-
-        self.gif_index = 0  # Starting index
-        self.update_scan(label)
-
-
-    def update_scan(self, label):
-        frame = self.gif_frames[self.gif_index]
-        label.config(image=frame)
-        self.gif_index = (self.gif_index + 1) % len(self.gif_frames)  # Loop the index
-        label.after(20, self.update_scan, label)  # Update every 20ms
+        # Frames are decoded on a worker thread, playback starts with the first
+        self.animations.play(label, animation_cache.stream(gif_file, (850, 850)))
 
     def display_qr_code(self):
-        self.clear_window()
+        self.screens.show('qr')
+
+    def refresh_qr_code(self):
+        # payment_qr.png is rewritten for every purchase; photo_cache keys it by mtime
+        qr_photo = photo_cache.load_file("payment_qr.png", (550, 550))
+        self.qr_label.configure(image=qr_photo)
+        self.qr_label.image = qr_photo  # Keep a reference
+
+    def build_qr_screen(self):
         qr_frame = ctk.CTkFrame(self, fg_color="#F6F7FB", corner_radius=0)
-        qr_frame.pack(expand=True, fill='both')
 
         # Create a frame to hold both QR and GIF side by side, centered
         row_frame = ctk.CTkFrame(qr_frame, fg_color="#F6F7FB")
         row_frame.pack(pady=130)
 
         # Display the additional image to the left using tk.Label
-        scan_image_pil = Image.open("scan.png")  # Make sure this image file exists
-        scan_photo = ImageTk.PhotoImage(scan_image_pil.resize((550, 450), Image.Resampling.LANCZOS))
+        scan_photo = photo_cache.load_file("scan.png", (550, 450))  # Make sure this image file exists
         scan_label = tk.Label(row_frame, image=scan_photo, bg="#F6F7FB")  # Using tk.Label here
         scan_label.image = scan_photo  # Keep a reference
         scan_label.pack(side='left', padx=10)
 
-        # Display the QR code to the right using tk.Label
-        qr_image_pil = Image.open("payment_qr.png")
-        qr_photo = ImageTk.PhotoImage(qr_image_pil.resize((550, 550), Image.Resampling.LANCZOS))
-        qr_label = tk.Label(row_frame, image=qr_photo, bg="#F6F7FB")  # Using tk.Label here
-        qr_label.image = qr_photo  # Keep a reference
-        qr_label.pack(side='right', padx=10)
+        # Display the QR code to the right using tk.Label, filled in by refresh_qr_code
+        self.qr_label = tk.Label(row_frame, bg="#F6F7FB")  # Using tk.Label here
+        self.qr_label.pack(side='right', padx=10)
 
 
 
@@ -327,6 +314,7 @@ class SelfCheckoutSystem(ctk.CTk):
         back_button.pack(pady=10)
         back_button = ctk.CTkButton(qr_frame, text="Complete", command=self.start_screen, corner_radius=10, fg_color="#F40000", hover_color="#C10000", font=("Arial", 16))
         back_button.pack(pady=10)
+        return qr_frame
 
 if __name__ == "__main__":
     app = SelfCheckoutSystem()
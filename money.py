@@ -0,0 +1,26 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+CURRENCY_SYMBOL = "$"
+MINOR_UNITS = 100  # Cents per dollar
+
+
+def to_cents(amount):
+    # Prices arrive as JSON floats; going through their shortest repr makes
+    # 1.1 exactly 110 instead of rounding 110.00000000000001 or 109.99999999999999
+    return int((Decimal(str(amount)) * MINOR_UNITS).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def to_amount(cents):
+    # Major units as a JSON number, for API payloads
+    return cents / MINOR_UNITS
+
+
+def format_money(cents):
+    sign = "-" if cents < 0 else ""
+    whole, fraction = divmod(abs(cents), MINOR_UNITS)
+    return f"{sign}{CURRENCY_SYMBOL}{whole}.{fraction:02d}"
+
+
+def with_price_cents(product):
+    # Copy of an API product with its selling price as integer cents in 'priceCents'
+    return {**product, 'priceCents': to_cents(product['sellingPrice'])}
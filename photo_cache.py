@@ -0,0 +1,50 @@
+import os
+from collections import OrderedDict
+
+from PIL import Image, ImageTk
+
+MAX_PHOTO_BYTES = 32 * 1024 * 1024
+
+
+class PhotoCache:
+    # Ready-to-use Tk images keyed by (key, size), shared by every screen. The
+    # budget counts decoded RGBA pixels; evicting only drops the cache's reference,
+    # so a widget still showing the image keeps it alive until it is destroyed.
+    # Tk images must be created on the Tk thread, so only use this from there.
+    def __init__(self, max_bytes=MAX_PHOTO_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # (key, size) -> (PhotoImage, bytes), oldest first
+        self.total_bytes = 0
+
+    def get(self, key, size):
+        entry = self.entries.get((key, size))
+        if entry is None:
+            return None
+        self.entries.move_to_end((key, size))
+        return entry[0]
+
+    def put(self, key, size, pil_image):
+        photo = ImageTk.PhotoImage(pil_image)
+        cost = photo.width() * photo.height() * 4
+        old = self.entries.pop((key, size), None)
+        if old:
+            self.total_bytes -= old[1]
+        self.entries[(key, size)] = (photo, cost)
+        self.total_bytes += cost
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.total_bytes -= evicted
+        return photo
+
+    def load_file(self, path, size):
+        # The file's mtime is part of the key, so a rewritten file such as
+        # payment_qr.png is never served stale
+        key = (path, os.stat(path).st_mtime_ns)
+        photo = self.get(key, size)
+        if photo is None:
+            with Image.open(path) as image:
+                photo = self.put(key, size, image.resize(size, Image.Resampling.LANCZOS))
+        return photo
+
+
+photo_cache = PhotoCache()
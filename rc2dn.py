@@ -1,18 +1,19 @@
-import threading
 import os
 import sys
 import customtkinter as ctk
 from tkinter import messagebox, simpledialog, ttk, StringVar, IntVar
 import tkinter as tk
-from PIL import Image, ImageTk
 import qrcode
 import json
-import requests
 import urllib.request
-import time
-import RPi.GPIO as GPIO
-from mfrc522 import SimpleMFRC522
 import pygame
+from photo_cache import photo_cache
+from animation import AnimationManager, animation_cache
+from catalog import ProductCatalog, CatalogRefresher, CatalogError
+from rfid import open_readers, ReaderManager
+from cart import Cart, line_name, line_total
+from money import format_money
+from ui_dispatch import UIDispatcher, RedrawScheduler
 
 # Configure CustomTkinter appearance and color theme
 ctk.set_appearance_mode("Light")
@@ -26,7 +27,11 @@ class SelfCheckoutSystem(ctk.CTk):
         screen_height = self.winfo_screenheight()
         self.geometry(f"{screen_width}x{screen_height}+0+0")
         self.configure(bg_color="#F6F7FB")
-        self.products = self.load_active_products()
+        self.ui = UIDispatcher(self)  # Worker threads hand Tk work to the main loop through this
+        self.cart_redraw = RedrawScheduler(self, self.update_cart_display)  # At most one cart update per frame
+        self.catalog = ProductCatalog('https://retailflash.up.railway.app/api/products/data/getwithstatus')
+        self.products = self.catalog.products  # Local snapshot, available without waiting for the API
+        self.load_active_products()
         pygame.mixer.init()
         self.sound = pygame.mixer.Sound('beep.wav')
         self.INSTRUCsound = pygame.mixer.Sound('instructor.wav')
@@ -34,31 +39,31 @@ class SelfCheckoutSystem(ctk.CTk):
         self.scanqrcode = pygame.mixer.Sound('scanqrcode.wav')
         self.warning_sound = pygame.mixer.Sound('timerend.wav')
 
-        self.reader = SimpleMFRC522()
-        GPIO.setwarnings(False)  # Disable GPIO warnings
-        self.cart = []  # Initialize the cart
+        self.readers = open_readers()  # MFRC522s, or trace replays when RFID_TRACE is set
+        self.cart = Cart()  # Scanned products by UID, with a running total
+        self.cart.subscribe(lambda event, product: self.cart_redraw.mark_dirty())
         self.cart_items = StringVar(value="")  # State management for cart items
         self.total_price = IntVar(value=0)  # State management for total price
         self.widgets_to_clear = []
-        self.rfid_thread_running = True  # Flag to control RFID reading
+        self.rfid_readers = None  # Polls the readers while the cart is open
         self.timer_running = False
+        self.animations = AnimationManager(self)  # Owns every GIF loop on screen
         self.start_screen()
 
     def load_active_products(self):
-        # Load all active products from the API
-        try:
-            url = 'https://retailflash.up.railway.app/api/products/data/getwithstatus'
-            response = requests.get(url)
-            if response.status_code == 200:
-                products = response.json()
-                active_products = {product['uid']: product for product in products if product['status'] == 'active'}
-                return active_products
-            else:
-                messagebox.showerror("Error", f"Failed to load products. Server returned: {response.status_code}")
-                return {}
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred while loading products: {e}")
-            return {}
+        # Keep the local catalog in sync with the API in the background
+        self.catalog_refresher = CatalogRefresher(self.catalog, on_done=self.set_products, on_error=self.on_catalog_error)
+        self.catalog_refresher.start()
+
+    def set_products(self, products):
+        self.products = products  # Single reference swap, readers never see a half-built index
+
+    def on_catalog_error(self, error):
+        if self.products:
+            print(f"Catalog refresh failed, using local snapshot: {error}")
+            return
+        message = str(error) if isinstance(error, CatalogError) else f"An error occurred while loading products: {error}"
+        self.ui.post(messagebox.showerror, "Error", message)
 
     def clear_window(self):
         for widget in self.widgets_to_clear:
@@ -68,14 +73,13 @@ class SelfCheckoutSystem(ctk.CTk):
                 print(f"Error while destroying widget: {e}")
         self.widgets_to_clear.clear()
 
-    def fetch_product_info(self, uid):
-        uid_str = str(uid)  # Convert UID to string
-        print(f"Reading UID: {uid_str}")
-        print(f"Available UIDs: {self.products.keys()}")
-        if uid_str in self.products:
-            product = self.products[uid_str]
-            self.add_product_to_cart(product)
-        else:
+    def fetch_product_info(self, uids):
+        print(f"Reading UIDs: {uids}")
+        products = self.products  # Read the index once, a refresh may swap it at any time
+        print(f"Available UIDs: {len(products)}")
+        found = [products[str(uid)] for uid in uids if str(uid) in products]
+        self.add_products_to_cart(found)
+        if len(found) < len(uids):
             messagebox.showerror("Error", "Product not found.")
 
     def start_screen(self):
@@ -113,29 +117,23 @@ class SelfCheckoutSystem(ctk.CTk):
         self.start_rfid_reader()
 
     def start_rfid_reader(self):
-        self.rfid_thread_running = True
-        threading.Thread(target=self.read_rfid).start()
-
-    def read_rfid(self):
-        try:
-            print("Place your RFID tag near the reader...")
-            while self.rfid_thread_running:
-                id, text = self.reader.read()
-                print(f"ID: {id}")
-                print(f"Text: {text}")
-                self.sound.play()
-                self.fetch_product_info(id)
-                time.sleep(2)  # Small delay to avoid multiple reads of the same tag
-        finally:
-            GPIO.cleanup()
+        print("Place your RFID tag near the reader...")
+        self.rfid_readers = ReaderManager(self.readers, self.read_rfid)
+        self.rfid_readers.start()
+
+    def read_rfid(self, ids):
+        # Runs on a reader thread with the tags newly presented, each once
+        print(f"IDs: {ids}")
+        self.sound.play()
+        self.ui.post(self.fetch_product_info, ids)  # Lookup and cart updates run on the Tk thread
 
     def stop_rfid_reader(self):
-        self.rfid_thread_running = False
+        if self.rfid_readers is not None:
+            self.rfid_readers.stop()
 
     def delete_item(self, uid):
         if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this item?"):
-            self.cart = [product for product in self.cart if product['uid'] != uid]
-            self.update_cart_display()
+            self.cart.remove(uid)
 
     def display_cart(self):
         self.clear_window()
@@ -157,10 +155,9 @@ class SelfCheckoutSystem(ctk.CTk):
         self.widgets_to_clear.append(buy_button)
 
     def update_cart_display(self):
-        cart_text = "\n".join([f"{product['name']} - ${product['sellingPrice']:.2f}" for product in self.cart])
+        cart_text = "\n".join([f"{line_name(line)} - {format_money(line_total(line))}" for line in self.cart])
         self.cart_items.set(cart_text)
-        total_price = sum(product['sellingPrice'] for product in self.cart)
-        self.total_price.set(f"Total Price: ${total_price:.2f}")
+        self.total_price.set(f"Total Price: {format_money(self.cart.total)}")
 
     def confirm_purchase(self):
         if not self.cart:
@@ -177,8 +174,8 @@ class SelfCheckoutSystem(ctk.CTk):
 
     def generate_qr_code(self):
         product_data = {
-            'uid': [product['uid'] for product in self.cart],
-            'total': f"${sum(product['sellingPrice'] for product in self.cart):.2f}"
+            'items': self.cart.quantities(),  # [uid, quantity] pairs
+            'total': format_money(self.cart.total)
         }
         qr_info = json.dumps(product_data)
         qr = qrcode.QRCode(
@@ -193,25 +190,8 @@ class SelfCheckoutSystem(ctk.CTk):
         img.save("payment_qr.png")  # Save to a known location
 
     def animate_gif(self, label, gif_file):
-        gif = Image.open(gif_file)
-        self.gif_frames = []
-        try:
-            for frame_num in range(gif.n_frames):
-                gif.seek(frame_num)
-                resized_frame = gif.copy().resize((250, 250), Image.Resampling.LANCZOS)
-                frame_image = ImageTk.PhotoImage(resized_frame)
-                self.gif_frames.append(frame_image)
-        except EOFError:
-            pass
-        self.gif_index = 0
-        self.update_scan(label)
-
-    def update_scan(self, label):
-        if self.gif_frames:
-            frame = self.gif_frames[self.gif_index]
-            label.config(image=frame)
-            self.gif_index = (self.gif_index + 1) % len(self.gif_frames)
-            label.after(20, self.update_scan, label)
+        # Frames are decoded on a worker thread, playback starts with the first
+        self.animations.play(label, animation_cache.stream(gif_file, (250, 250)))
 
     def display_qr_code(self):
         self.clear_window()
@@ -220,8 +200,7 @@ class SelfCheckoutSystem(ctk.CTk):
         qr_frame.pack(expand=True, fill='both')
         self.widgets_to_clear.append(qr_frame)
 
-        qr_image_pil = Image.open("payment_qr.png")
-        qr_photo = ImageTk.PhotoImage(qr_image_pil.resize((300, 300), Image.Resampling.LANCZOS))  # Adjust size as needed
+        qr_photo = photo_cache.load_file("payment_qr.png", (300, 300))  # Adjust size as needed
         qr_label = tk.Label(qr_frame, image=qr_photo, bg="#F6F7FB")
         qr_label.image = qr_photo
         qr_label.pack(pady=20)
@@ -261,22 +240,15 @@ class SelfCheckoutSystem(ctk.CTk):
 
     def restart_application(self):
         self.timer_running = False
+        self.catalog_refresher.stop()
+        self.catalog.store.close()
         self.clear_window()
         self.destroy()
         os.execl(sys.executable, sys.executable, *sys.argv)
 
-    def add_product_to_cart(self, product):
-        if any(p['uid'] == product['uid'] for p in self.cart):
-            self.display_duplicate_message()
-        else:
-            self.cart.append(product)
-            self.update_cart_display()  # Update cart display when a new product is added
-
-    def display_duplicate_message(self):
-        duplicate_label = ctk.CTkLabel(self, text="Product already in cart.", font=("Arial", 20), fg_color="#F6F7FB", text_color="red")
-        duplicate_label.pack(pady=10)
-        self.widgets_to_clear.append(duplicate_label)
-        self.after(3000, duplicate_label.destroy)  # Remove the label after 3 seconds
+    def add_products_to_cart(self, products):
+        # A repeat scan adds one more unit to its line; a batch is one update
+        self.cart.add_many(products)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,52 @@
+import threading
+import time
+
+HOLD_OFF = 1.0  # Seconds a UID must be out of the field before it counts again
+EXPIRE_INTERVAL = 30.0  # Seconds between sweeps of UIDs no longer in the field
+
+
+class ReadFilter:
+    # Drops rereads of a tag that is still on the antenna. Keeps UID ->
+    # last seen (monotonic seconds); a read is accepted when its UID was not
+    # seen within `hold_off`, and every read, accepted or not, refreshes the
+    # UID. Lookups are O(1) and only ever hold back the same UID. UIDs idle
+    # for longer than the hold-off are swept every `expire_interval`, so the
+    # map only holds tags seen recently. Safe to share between threads.
+    def __init__(self, hold_off=HOLD_OFF, expire_interval=EXPIRE_INTERVAL):
+        self.hold_off = hold_off
+        self.expire_interval = expire_interval
+        self.lock = threading.Lock()
+        self.last_seen = {}  # uid -> monotonic time of its latest read
+        self.next_expiry = time.monotonic() + expire_interval
+        self.reads = 0
+        self.accepted = 0
+        self.suppressed = 0
+        self.expired = 0
+
+    def accept(self, uid, now=None):
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            self.reads += 1
+            last = self.last_seen.get(uid)
+            self.last_seen[uid] = now
+            if now >= self.next_expiry:
+                self.expire(now)
+            if last is not None and now - last < self.hold_off:
+                self.suppressed += 1
+                return False
+            self.accepted += 1
+            return True
+
+    def expire(self, now):
+        # Called with the lock held
+        stale = [uid for uid, seen in self.last_seen.items() if now - seen >= self.hold_off]
+        for uid in stale:
+            del self.last_seen[uid]
+        self.expired += len(stale)
+        self.next_expiry = now + self.expire_interval
+
+    def stats(self):
+        with self.lock:
+            return {'reads': self.reads, 'accepted': self.accepted, 'suppressed': self.suppressed,
+                    'expired': self.expired, 'tracked': len(self.last_seen)}
@@ -1,22 +1,26 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import customtkinter as ctk
-from mfrc522 import SimpleMFRC522
 import pygame
 import pyperclip
-import RPi.GPIO as GPIO
 import pandas as pd
-import threading
+from cart_view import VirtualList
+from ui_dispatch import UIDispatcher, RedrawScheduler
+from rfid import open_readers, ReaderManager
+
+ROW_HEIGHT = 55  # Pixels per tag row, including the gap below it
 
 class RFIDApp(ctk.CTk):
     def _init_(self):
         super()._init_()
-        GPIO.setwarnings(False)  # Disable GPIO warnings
-        self.reader = SimpleMFRC522()
+        self.readers = open_readers()  # MFRC522s, or trace replays when RFID_TRACE is set
         self.title("iibiye RFID Reader")
         self.geometry("{0}x{1}+0+0".format(self.winfo_screenwidth(), self.winfo_screenheight()))  # Maximize window on startup
 
-        self.cart_items = []
+        self.cart_items = []  # Tag IDs in the order they were enrolled
+        self.positions = {}  # tag ID -> index in cart_items
+        self.ui = UIDispatcher(self)  # The reader thread hands Tk work to the main loop through this
+        self.cart_redraw = RedrawScheduler(self, self.update_cart_display)  # At most one list update per frame
         
         self.display_cart()
 
@@ -24,25 +28,27 @@ class RFIDApp(ctk.CTk):
         self.sound = pygame.mixer.Sound('beep.wav')
         print("Starting to read tags...")
 
-        # Start reading tags in a separate thread
-        threading.Thread(target=self.read_tag, daemon=True).start()
-
-    def read_tag(self):
-        while True:
-            try:
-                id, text = self.reader.read()
-                if id:
-                    if id in self.cart_items:
-                        serial_number = self.cart_items.index(id) + 1
-                        self.show_message(f"Tag ID {id} is already in the list at serial number {serial_number}.")
-                    else:
-                        self.cart_items.append(id)
-                        self.update_cart_display()
-                        self.sound.play()
-                        print(f"Tag read: {id}")
-            except Exception as e:
-                print("Error reading tag:", e)
-            self.after(1000)  # Continue reading after 1 second
+        # Poll each reader on its own thread; a tag left on them is read once
+        self.rfid_readers = ReaderManager(self.readers, self.read_tag)
+        self.rfid_readers.start()
+
+    def read_tag(self, ids):
+        # Runs on a reader thread; rereads of a tag still on a reader were
+        # already dropped there, so this is once per presentation
+        for id in ids:
+            if id:
+                self.ui.post(self.add_tag, id)
+
+    def add_tag(self, id):
+        position = self.positions.get(id)
+        if position is not None:
+            self.show_message(f"Tag ID {id} is already in the list at serial number {position + 1}.")
+        else:
+            self.positions[id] = len(self.cart_items)
+            self.cart_items.append(id)
+            self.cart_redraw.mark_dirty()
+            self.sound.play()
+            print(f"Tag read: {id}")
 
     def display_cart(self):
         self.clear_window()
@@ -67,48 +73,57 @@ class RFIDApp(ctk.CTk):
 
         scrollbar = ttk.Scrollbar(cart_frame, orient="vertical", command=self.cart_display.yview)
         scrollbar.pack(side='right', fill='y')
-        self.cart_display.configure(yscrollcommand=scrollbar.set)
-        self.cart_window = ttk.Frame(self.cart_display)
-        self.cart_display.create_window((0, 0), window=self.cart_window, anchor='nw')
-        self.cart_window.bind("<Configure>", lambda e: self.cart_display.configure(scrollregion=self.cart_display.bbox("all")))
+        # Enrolment sessions run to hundreds of tags; only the rows in view exist
+        self.cart_list = VirtualList(self.cart_display, ROW_HEIGHT, self.create_row, self.show_row, scrollbar=scrollbar)
 
         self.update_cart_display()
         print("Cart displayed")
 
     def update_cart_display(self):
-        for widget in self.cart_window.winfo_children():
-            widget.destroy()
-        for index, item in enumerate(self.cart_items, start=1):
-            row_frame = ctk.CTkFrame(self.cart_window, fg_color="white", corner_radius=10)
-            row_frame.pack(fill='x', pady=5, padx=10)
+        self.cart_list.set_items(self.cart_items)
+        print("Cart updated")
 
-            serial_label = ctk.CTkLabel(row_frame, text=f"{index}.", font=("Arial", 16), fg_color="white")
-            serial_label.pack(side='left', padx=5, pady=5)
+    def create_row(self, parent):
+        row = {'id': None}
+        row_frame = ctk.CTkFrame(parent, fg_color="white", corner_radius=10)
 
-            tag_label = ctk.CTkLabel(row_frame, text=f"{item}", font=("Arial", 16), fg_color="white")
-            tag_label.pack(side='left', padx=5, pady=5)
+        serial_label = ctk.CTkLabel(row_frame, text="", font=("Arial", 16), fg_color="white")
+        serial_label.pack(side='left', padx=5, pady=5)
 
-            copy_button = ctk.CTkButton(row_frame, text="Copy", command=lambda id=item: self.copy_id(id), corner_radius=10, fg_color="#F40000", hover_color="#C10000", font=("Arial", 16))
-            copy_button.pack(side='right', padx=5, pady=5)
+        tag_label = ctk.CTkLabel(row_frame, text="", font=("Arial", 16), fg_color="white")
+        tag_label.pack(side='left', padx=5, pady=5)
 
-            delete_button = ctk.CTkButton(row_frame, text="Delete", command=lambda id=item: self.delete_id(id), corner_radius=10, fg_color="#F40000", hover_color="#C10000", font=("Arial", 16))
-            delete_button.pack(side='right', padx=5, pady=5)
+        copy_button = ctk.CTkButton(row_frame, text="Copy", command=lambda: self.copy_id(row['id']), corner_radius=10, fg_color="#F40000", hover_color="#C10000", font=("Arial", 16))
+        copy_button.pack(side='right', padx=5, pady=5)
 
-        print("Cart updated")
+        delete_button = ctk.CTkButton(row_frame, text="Delete", command=lambda: self.delete_id(row['id']), corner_radius=10, fg_color="#F40000", hover_color="#C10000", font=("Arial", 16))
+        delete_button.pack(side='right', padx=5, pady=5)
+
+        row.update(frame=row_frame, serial=serial_label, tag=tag_label)
+        return row
+
+    def show_row(self, row, item, index):
+        row['id'] = item
+        row['serial'].configure(text=f"{index + 1}.")
+        row['tag'].configure(text=f"{item}")
 
     def copy_id(self, id):
         pyperclip.copy(str(id))
         print("ID copied to clipboard")
 
     def delete_id(self, id):
-        if id in self.cart_items:
-            self.cart_items.remove(id)
-            self.update_cart_display()
+        position = self.positions.pop(id, None)
+        if position is not None:
+            del self.cart_items[position]
+            for index in range(position, len(self.cart_items)):
+                self.positions[self.cart_items[index]] = index  # Rows below move up one
+            self.cart_redraw.mark_dirty()
             print(f"Tag ID {id} removed from the cart")
 
     def restart(self):
         self.cart_items = []
-        self.update_cart_display()
+        self.positions = {}
+        self.cart_redraw.mark_dirty()
         print("Cart restarted")
 
     def download(self):
@@ -127,7 +142,7 @@ class RFIDApp(ctk.CTk):
         messagebox.showinfo("Duplicate Tag", message)
 
     def on_close(self):
-        GPIO.cleanup()
+        self.rfid_readers.stop()  # Closes the readers
         self.destroy()
 
 if _name_ == "_main_":
@@ -0,0 +1,299 @@
+import os
+import random
+import sys
+import threading
+import time
+
+from read_filter import ReadFilter
+from uhf import SerialTunnelReader
+
+TRACE_ENV = "RFID_TRACE"  # Path of a trace to replay instead of using the hardware reader
+RATE_ENV = "RFID_TRACE_RATE"  # Replay speed, 2 = twice as fast as recorded
+RECORD_ENV = "RFID_RECORD"  # Path to append every hardware read to, as a trace
+DEVICES_ENV = "RFID_SPI_DEVICES"  # Comma separated bus.device of each MFRC522, e.g. "0.0,0.1"
+SERIAL_ENV = "RFID_SERIAL"  # Comma separated serial ports of UHF bulk readers, e.g. "/dev/ttyUSB0"
+POLL_INTERVAL = 0.02  # Seconds between polls of the reader
+
+
+def parse_uid(text):
+    # The MFRC522 reports UIDs as integers; traces may also hold other tag IDs
+    return int(text) if text.isdigit() else text
+
+
+def load_trace(path):
+    # A trace is one read per line: seconds since the start, whitespace, UID.
+    # Blank lines and lines starting with '#' are ignored.
+    trace = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                seconds, uid = line.split(None, 1)
+                trace.append((float(seconds), parse_uid(uid.strip())))
+            except ValueError:
+                raise ValueError(f"{path}:{number}: expected '<seconds> <uid>', got {line!r}") from None
+    trace.sort(key=lambda read: read[0])
+    return trace
+
+
+def save_trace(path, trace):
+    with open(path, 'w') as f:
+        for seconds, uid in trace:
+            f.write(f"{seconds:.3f} {uid}\n")
+
+
+def make_trace(uids, count, rate=1.0, burst=1, duplicates=0, reread_interval=0.05, seed=None):
+    # Synthetic trace of `count` tag presentations, `rate` per second. Each
+    # presentation puts `burst` different tags on the antenna together (reads
+    # a few milliseconds apart), and every tag is read again `duplicates`
+    # times, `reread_interval` seconds apart, as a tag resting on the reader is.
+    rng = random.Random(seed)
+    trace = []
+    for presentation in range(count):
+        start = presentation / rate
+        for slot, uid in enumerate(rng.sample(uids, min(burst, len(uids)))):
+            first = start + slot * 0.003
+            for reread in range(duplicates + 1):
+                trace.append((round(first + reread * reread_interval, 3), uid))
+    trace.sort(key=lambda read: read[0])
+    return trace
+
+
+# Readers have a non-blocking poll(), returning the UID of a tag in the field
+# or None, close(), and a name for logs. Bulk readers have poll_batch()
+# instead, returning a list of UIDs, and may have stats(). Readers wired to
+# the Pi's GPIO have `gpio`, the RPi.GPIO module, which ReaderManager cleans
+# up once after every reader is closed. A tag resting on the antenna is
+# returned by poll after poll; ReaderManager turns that into one event per
+# presentation.
+
+
+class HardwareReader:
+    # MFRC522 on the Pi's SPI bus, on chip select `device` of `bus`. Drives the
+    # MFRC522 class directly: SimpleMFRC522 always opens 0.0, and its
+    # Close_MFRC522() also resets every GPIO pin, which must wait until all
+    # readers are done. The mfrc522 and RPi.GPIO packages are only imported
+    # here, so the apps still start on a machine without them.
+    def __init__(self, bus=0, device=0):
+        import RPi.GPIO as GPIO
+        from mfrc522 import MFRC522
+        GPIO.setwarnings(False)  # Disable GPIO warnings
+        self.gpio = GPIO
+        self.name = f"spi{bus}.{device}"
+        self.reader = MFRC522(bus=bus, device=device)
+
+    def poll(self):
+        # Request + anticollision only: the UID, without authenticating and
+        # reading the data block, as SimpleMFRC522.read_id_no_block() does
+        reader = self.reader
+        status, _ = reader.MFRC522_Request(reader.PICC_REQIDL)
+        if status != reader.MI_OK:
+            return None
+        status, uid = reader.MFRC522_Anticoll()
+        if status != reader.MI_OK:
+            return None
+        number = 0
+        for byte in uid[:5]:  # Four UID bytes and their check byte, as SimpleMFRC522 numbers them
+            number = number * 256 + byte
+        return number
+
+    def close(self):
+        self.reader.spi.close()
+
+
+class SimulatedReader:
+    # Replays a trace of (seconds, uid) reads with the recorded timing, sped up
+    # or slowed down by `rate`, so the scan -> lookup -> cart -> redraw path
+    # can be driven and timed without hardware. Each poll() returns the next
+    # read that is due, so reads closer together than the poll interval come
+    # out one poll apart, as from a real reader.
+    def __init__(self, trace, rate=1.0, loop=False, name="trace"):
+        self.trace = list(trace)
+        self.rate = rate
+        self.loop = loop
+        self.name = name
+        self.position = 0
+        self.started = None
+
+    def poll(self):
+        now = time.monotonic()
+        if self.started is None:
+            self.started = now
+        if self.position == len(self.trace):
+            if not self.loop or not self.trace:
+                return None
+            self.position = 0
+            self.started = now
+        seconds, uid = self.trace[self.position]
+        if self.started + seconds / self.rate > now:
+            return None
+        self.position += 1
+        return uid
+
+    def close(self):
+        pass
+
+
+class RecordingReader:
+    # Wraps a reader and appends each read to a trace file, to capture field
+    # sessions for replay with SimulatedReader
+    def __init__(self, reader, path):
+        self.reader = reader
+        self.name = reader.name
+        self.gpio = getattr(reader, 'gpio', None)
+        self.file = open(path, 'a')
+        self.started = time.monotonic()
+
+    def poll(self):
+        uid = self.reader.poll()
+        if uid is not None:
+            self.file.write(f"{time.monotonic() - self.started:.3f} {uid}\n")
+            self.file.flush()
+        return uid
+
+    def close(self):
+        self.reader.close()
+        self.file.close()
+
+
+class TagPoller:
+    # Polls one reader on its own thread every `interval` seconds and passes
+    # the UIDs of each poll, as a list, to on_read(uids, poller). on_read
+    # returns True if there was a new tag among them, and the reader is then
+    # polled again at once, since more tags may be waiting. Counts reads and
+    # errors; the reader is closed when the poller stops.
+    def __init__(self, reader, on_read, interval=POLL_INTERVAL):
+        self.reader = reader
+        self.name = reader.name
+        self.on_read = on_read
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = None
+        self.started = None
+        self.reads = 0
+        self.tags = 0  # Reads accepted as new tags, counted by the caller
+        self.errors = 0
+        self.last_error = None
+
+    def start(self):
+        self.stopped.clear()
+        self.started = time.monotonic()
+        self.thread = threading.Thread(target=self.run, name=f"rfid-{self.name}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        # Waits for the thread, so the reader is closed once this returns
+        self.stopped.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def run(self):
+        try:
+            while not self.stopped.is_set():
+                try:
+                    uids = self.poll()
+                except Exception as e:
+                    self.errors += 1
+                    if str(e) != self.last_error:  # A failing reader repeats itself every poll
+                        self.last_error = str(e)
+                        print(f"Error reading tag on {self.name}: {e}")
+                    uids = []
+                if uids:
+                    self.reads += len(uids)
+                    if self.on_read(uids, self):
+                        continue
+                self.stopped.wait(self.interval)
+        finally:
+            self.reader.close()
+
+    def poll(self):
+        if hasattr(self.reader, 'poll_batch'):
+            return self.reader.poll_batch()
+        uid = self.reader.poll()
+        return [] if uid is None else [uid]
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started if self.started is not None else 0
+        stats = {'reads': self.reads, 'tags': self.tags, 'errors': self.errors,
+                 'reads_per_second': round(self.reads / elapsed, 1) if elapsed else 0.0}
+        if hasattr(self.reader, 'stats'):
+            stats.update(self.reader.stats())
+        return stats
+
+
+class ReaderManager:
+    # Runs any number of readers at once, one TagPoller thread each, and merges
+    # their reads into one stream: on_tags(uids) gets each presentation of a
+    # tag once, in the order the tags were accepted, however many readers saw
+    # it. A poll's new tags come in one call, so a bulk reader's whole pass is
+    # one list. All readers share `read_filter` (a ReadFilter, its default
+    # hold-off unless given), so a tag in reach of two antennas counts once.
+    # on_tags runs on the reading thread, one call at a time.
+    def __init__(self, readers, on_tags, interval=POLL_INTERVAL, read_filter=None):
+        self.on_tags = on_tags
+        self.read_filter = read_filter or ReadFilter()
+        self.lock = threading.Lock()
+        self.pollers = [TagPoller(reader, self.merge, interval) for reader in readers]
+
+    def start(self):
+        for poller in self.pollers:
+            poller.start()
+
+    def stop(self):
+        for poller in self.pollers:
+            poller.stop()
+        # Every reader is closed now; the GPIO pins are shared, so reset them once
+        for gpio in {getattr(poller.reader, 'gpio', None) for poller in self.pollers} - {None}:
+            gpio.cleanup()
+        for name, stats in self.stats().items():
+            print(f"RFID {name}: {stats}")
+
+    def merge(self, uids, poller):
+        # Accepting and handing on under one lock keeps the stream in order
+        with self.lock:
+            accepted = [uid for uid in uids if self.read_filter.accept(uid)]
+            if not accepted:
+                return False
+            poller.tags += len(accepted)
+            self.on_tags(accepted)
+            return True
+
+    def stats(self):
+        stats = {poller.name: poller.stats() for poller in self.pollers}
+        stats['filter'] = self.read_filter.stats()
+        return stats
+
+
+def open_readers():
+    # The readers the apps use: a replay of each trace in RFID_TRACE (paths
+    # separated by os.pathsep), otherwise a UHF bulk reader on each port in
+    # RFID_SERIAL and an MFRC522 on each SPI bus.device in RFID_SPI_DEVICES
+    # (default 0.0 when there are no serial readers), the MFRC522s recorded
+    # to RFID_RECORD if set
+    traces = os.environ.get(TRACE_ENV)
+    if traces:
+        rate = float(os.environ.get(RATE_ENV, 1.0))
+        return [SimulatedReader(load_trace(path), rate=rate, name=path) for path in traces.split(os.pathsep)]
+    ports = [port.strip() for port in os.environ.get(SERIAL_ENV, "").split(",") if port.strip()]
+    devices = [device.strip() for device in os.environ.get(DEVICES_ENV, "" if ports else "0.0").split(",") if device.strip()]
+    readers = []
+    for device in devices:
+        bus, chip_select = device.split(".")
+        readers.append(HardwareReader(int(bus), int(chip_select)))
+    record = os.environ.get(RECORD_ENV)
+    if record:
+        # One trace per reader when there are several
+        readers = [RecordingReader(reader, record if len(readers) == 1 else f"{record}.{reader.name}")
+                   for reader in readers]
+    return readers + [SerialTunnelReader(port) for port in ports]
+
+
+if __name__ == "__main__":
+    # Write a synthetic trace for load tests:
+    #   python rfid.py out.trace count rate burst duplicates uid [uid ...]
+    if len(sys.argv) < 7:
+        sys.exit("usage: python rfid.py out.trace count rate burst duplicates uid [uid ...]")
+    out, count, rate, burst, duplicates = sys.argv[1:6]
+    save_trace(out, make_trace([parse_uid(uid) for uid in sys.argv[6:]], int(count), float(rate), int(burst), int(duplicates)))
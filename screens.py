@@ -0,0 +1,37 @@
+class ScreenManager:
+    # Every screen is a frame built the first time it is shown and then kept for
+    # the life of the window. Switching unpacks the current frame and packs the
+    # next one, so nothing is destroyed or rebuilt on a transition. Unmapping
+    # a screen frame sends no <Unmap> to the labels inside it, so after a switch
+    # `animations` (an AnimationManager) pauses the animations of the hidden
+    # screen and resumes those of the shown one. A screen's refresh(), if any,
+    # runs on every show to update its dynamic data.
+    def __init__(self, root, animations=None, **pack_options):
+        self.root = root
+        self.animations = animations
+        self.pack_options = pack_options or {'expand': True, 'fill': 'both'}
+        self.builders = {}  # name -> (build, refresh)
+        self.frames = {}  # name -> frame, once built
+        self.current = None
+
+    def add(self, name, build, refresh=None):
+        # build() returns the screen's top-level frame, unpacked
+        self.builders[name] = (build, refresh)
+
+    def show(self, name):
+        build, refresh = self.builders[name]
+        frame = self.frames.get(name)
+        if frame is None:
+            frame = self.frames[name] = build()
+        if self.current != name:
+            if self.current is not None:
+                self.frames[self.current].pack_forget()
+            frame.pack(**self.pack_options)
+            frame.tkraise()
+            self.current = name
+            if self.animations is not None:
+                self.root.update_idletasks()  # Map the new screen now, so viewability is current
+                self.animations.update_visibility()
+        if refresh is not None:
+            refresh()
+        return frame
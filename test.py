@@ -1,18 +1,19 @@
-import threading
 import os
 import sys
 import customtkinter as ctk
 from tkinter import messagebox, simpledialog, ttk
 import tkinter as tk
-from PIL import Image, ImageTk
 import qrcode
 import json
-import requests
-import urllib.request
-import time
-import RPi.GPIO as GPIO
-from mfrc522 import SimpleMFRC522
 import pygame
+from photo_cache import photo_cache
+from animation import AnimationManager, animation_cache
+from catalog import ProductCatalog, CatalogRefresher, CatalogError
+from rfid import open_readers, ReaderManager
+from cart import Cart, line_name, line_total
+from money import format_money
+from ui_dispatch import UIDispatcher, RedrawScheduler
+from image_loader import ImageLoader
 
 # Configure CustomTkinter appearance and color theme
 ctk.set_appearance_mode("Light")
@@ -26,7 +27,12 @@ class SelfCheckoutSystem(ctk.CTk):
         screen_height = self.winfo_screenheight()
         self.geometry(f"{screen_width}x{screen_height}+0+0")
         self.configure(bg_color="#F6F7FB")
-        self.products = self.load_active_products()
+        self.ui = UIDispatcher(self)  # Worker threads hand Tk work to the main loop through this
+        self.cart_redraw = RedrawScheduler(self, self.display_cart)  # At most one cart rebuild per frame
+        self.catalog = ProductCatalog('https://retailflash.up.railway.app/api/products/data/getwithstatus')
+        self.products = self.catalog.products  # Local snapshot, available without waiting for the API
+        self.load_active_products()
+        self.image_loader = ImageLoader(self.ui, "https://retailflash.up.railway.app/")  # Cart thumbnails, fetched off the Tk thread
         pygame.mixer.init()
         self.sound = pygame.mixer.Sound('beep.wav')
         self.INSTRUCsound = pygame.mixer.Sound('instructor.wav')
@@ -34,29 +40,29 @@ class SelfCheckoutSystem(ctk.CTk):
         self.scanqrcode = pygame.mixer.Sound('scanqrcode.wav')
         self.warning_sound = pygame.mixer.Sound('timerend.wav')
 
-        self.reader = SimpleMFRC522()
-        GPIO.setwarnings(False)  # Disable GPIO warnings
-        self.cart = []  # Initialize the cart
+        self.readers = open_readers()  # MFRC522s, or trace replays when RFID_TRACE is set
+        self.cart = Cart()  # Scanned products by UID, with a running total
+        self.cart.subscribe(lambda event, product: self.cart_redraw.mark_dirty())
         self.widgets_to_clear = []
-        self.rfid_thread_running = True  # Flag to control RFID reading
+        self.rfid_readers = None  # Polls the readers while the cart is open
         self.timer_running = False
+        self.animations = AnimationManager(self)  # Owns every GIF loop on screen
         self.start_screen()
 
     def load_active_products(self):
-        # Load all active products from the API
-        try:
-            url = 'https://retailflash.up.railway.app/api/products/data/getwithstatus'
-            response = requests.get(url)
-            if response.status_code == 200:
-                products = response.json()
-                active_products = {product['uid']: product for product in products if product['status'] == 'active'}
-                return active_products
-            else:
-                messagebox.showerror("Error", f"Failed to load products. Server returned: {response.status_code}")
-                return {}
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred while loading products: {e}")
-            return {}
+        # Keep the local catalog in sync with the API in the background
+        self.catalog_refresher = CatalogRefresher(self.catalog, on_done=self.set_products, on_error=self.on_catalog_error)
+        self.catalog_refresher.start()
+
+    def set_products(self, products):
+        self.products = products  # Single reference swap, readers never see a half-built index
+
+    def on_catalog_error(self, error):
+        if self.products:
+            print(f"Catalog refresh failed, using local snapshot: {error}")
+            return
+        message = str(error) if isinstance(error, CatalogError) else f"An error occurred while loading products: {error}"
+        self.ui.post(messagebox.showerror, "Error", message)
 
     def clear_window(self):
         for widget in self.widgets_to_clear:
@@ -66,14 +72,15 @@ class SelfCheckoutSystem(ctk.CTk):
                 print(f"Error while destroying widget: {e}")
         self.widgets_to_clear.clear()
 
-    def fetch_product_info(self, uid):
-        uid_str = str(uid)  # Convert UID to string
-        print(f"Reading UID: {uid_str}")
-        print(f"Available UIDs: {self.products.keys()}")
-        if uid_str in self.products:
-            product = self.products[uid_str]
-            self.add_product_to_cart(product)
-        else:
+    def fetch_product_info(self, uids):
+        print(f"Reading UIDs: {uids}")
+        products = self.products  # Read the index once, a refresh may swap it at any time
+        print(f"Available UIDs: {len(products)}")
+        found = [products[str(uid)] for uid in uids if str(uid) in products]
+        for product in found:
+            self.image_loader.prefetch(product['image'])  # Start the downloads before the rows are drawn
+        self.add_products_to_cart(found)
+        if len(found) < len(uids):
             messagebox.showerror("Error", "Product not found.")
 
     def start_screen(self):
@@ -111,29 +118,23 @@ class SelfCheckoutSystem(ctk.CTk):
         self.start_rfid_reader()
 
     def start_rfid_reader(self):
-        self.rfid_thread_running = True
-        threading.Thread(target=self.read_rfid).start()
-
-    def read_rfid(self):
-        try:
-            print("Place your RFID tag near the reader...")
-            while self.rfid_thread_running:
-                id, text = self.reader.read()
-                print(f"ID: {id}")
-                print(f"Text: {text}")
-                self.sound.play()
-                self.fetch_product_info(id)
-                time.sleep(2)  # Small delay to avoid multiple reads of the same tag
-        finally:
-            GPIO.cleanup()
+        print("Place your RFID tag near the reader...")
+        self.rfid_readers = ReaderManager(self.readers, self.read_rfid)
+        self.rfid_readers.start()
+
+    def read_rfid(self, ids):
+        # Runs on a reader thread with the tags newly presented, each once
+        print(f"IDs: {ids}")
+        self.sound.play()
+        self.ui.post(self.fetch_product_info, ids)  # Lookup and cart updates run on the Tk thread
 
     def stop_rfid_reader(self):
-        self.rfid_thread_running = False
+        if self.rfid_readers is not None:
+            self.rfid_readers.stop()
 
     def delete_item(self, uid):
         if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this item?"):
-            self.cart = [product for product in self.cart if product['uid'] != uid]
-            self.display_cart()  # Refresh cart display
+            self.cart.remove(uid)
 
     def display_cart(self):
         self.clear_window()
@@ -179,13 +180,9 @@ class SelfCheckoutSystem(ctk.CTk):
             row_frame.pack(fill='both', expand=True, pady=10, padx=10)
             self.widgets_to_clear.append(row_frame)
 
-            img_path = product['image']
-            img_url = "https://retailflash.up.railway.app/" + img_path.replace('\\', '/')
-            pil_image = Image.open(urllib.request.urlopen(img_url)).resize((100, 100), Image.Resampling.LANCZOS)
-            photo = ImageTk.PhotoImage(pil_image)
-            image_label = tk.Label(row_frame, image=photo)
-            image_label.image = photo
+            image_label = tk.Label(row_frame)
             image_label.pack(side='left', padx=10, pady=30)
+            self.image_loader.show(image_label, product['image'])
 
 
             self.widgets_to_clear.append(image_label)
@@ -194,20 +191,18 @@ class SelfCheckoutSystem(ctk.CTk):
             delete_button.pack(side='right', padx=30)
             self.widgets_to_clear.append(delete_button)
 
-            price_label = ctk.CTkLabel(row_frame, text=f"${product['sellingPrice']:0.3f}", font=("Arial", 16), fg_color="#F6F7FB", text_color="black")
+            price_label = ctk.CTkLabel(row_frame, text=format_money(line_total(product)), font=("Arial", 16), fg_color="#F6F7FB", text_color="black")
             price_label.pack(side='right', padx=30)
             self.widgets_to_clear.append(price_label)
 
-            name_label = ctk.CTkLabel(row_frame, text=product['name'], font=("Arial", 16), fg_color="#F6F7FB", text_color="black")
+            name_label = ctk.CTkLabel(row_frame, text=line_name(product), font=("Arial", 16), fg_color="#F6F7FB", text_color="black")
             name_label.pack(side='left', padx=30)
             self.widgets_to_clear.append(name_label)
 
         canvas.pack(side="right", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
 
-        total_price = sum(p['sellingPrice'] for p in self.cart)
-
-        total_label = ctk.CTkLabel(cart_frame, text=f"Total Price: ${total_price:.3f}", font=("Arial", 20), fg_color="#F6F7FB", text_color="black")
+        total_label = ctk.CTkLabel(cart_frame, text=f"Total Price: {format_money(self.cart.total)}", font=("Arial", 20), fg_color="#F6F7FB", text_color="black")
         total_label.pack(padx=20, pady=200)
 
         self.widgets_to_clear.append(total_label)
@@ -232,8 +227,8 @@ class SelfCheckoutSystem(ctk.CTk):
 
     def generate_qr_code(self):
         product_data = {
-            'uid': [product['uid'] for product in self.cart],
-            'total': f"${sum(product['sellingPrice'] for product in self.cart):.2f}"
+            'items': self.cart.quantities(),  # [uid, quantity] pairs
+            'total': format_money(self.cart.total)
         }
         qr_info = json.dumps(product_data)
         qr = qrcode.QRCode(
@@ -248,25 +243,8 @@ class SelfCheckoutSystem(ctk.CTk):
         img.save("payment_qr.png")  # Save to a known location
 
     def animate_gif(self, label, gif_file):
-        gif = Image.open(gif_file)
-        self.gif_frames = []
-        try:
-            for frame_num in range(gif.n_frames):
-                gif.seek(frame_num)
-                resized_frame = gif.copy().resize((250, 250), Image.Resampling.LANCZOS)
-                frame_image = ImageTk.PhotoImage(resized_frame)
-                self.gif_frames.append(frame_image)
-        except EOFError:
-            pass
-        self.gif_index = 0
-        self.update_scan(label)
-
-    def update_scan(self, label):
-        if self.gif_frames:
-            frame = self.gif_frames[self.gif_index]
-            label.config(image=frame)
-            self.gif_index = (self.gif_index + 1) % len(self.gif_frames)
-            label.after(20, self.update_scan, label)
+        # Frames are decoded on a worker thread, playback starts with the first
+        self.animations.play(label, animation_cache.stream(gif_file, (250, 250)))
 
     def display_qr_code(self):
         self.clear_window()
@@ -275,8 +253,7 @@ class SelfCheckoutSystem(ctk.CTk):
         qr_frame.pack(expand=True, fill='both')
         self.widgets_to_clear.append(qr_frame)
 
-        qr_image_pil = Image.open("payment_qr.png")
-        qr_photo = ImageTk.PhotoImage(qr_image_pil.resize((300, 300), Image.Resampling.LANCZOS))  # Adjust size as needed
+        qr_photo = photo_cache.load_file("payment_qr.png", (300, 300))  # Adjust size as needed
         qr_label = tk.Label(qr_frame, image=qr_photo, bg="#F6F7FB")
         qr_label.image = qr_photo
         qr_label.pack(pady=20)
@@ -316,22 +293,16 @@ class SelfCheckoutSystem(ctk.CTk):
 
     def restart_application(self):
         self.timer_running = False
+        self.catalog_refresher.stop()
+        self.catalog.store.close()
+        self.image_loader.shutdown()
         self.clear_window()
         self.destroy()
         os.execl(sys.executable, sys.executable, *sys.argv)
 
-    def add_product_to_cart(self, product):
-        if any(p['uid'] == product['uid'] for p in self.cart):
-            self.display_duplicate_message()
-        else:
-            self.cart.append(product)
-            self.display_cart()  # Refresh cart display
-
-    def display_duplicate_message(self):
-        duplicate_label = ctk.CTkLabel(self, text="Product already in cart.", font=("Arial", 20), fg_color="#F6F7FB", text_color="red")
-        duplicate_label.pack(pady=10)
-        self.widgets_to_clear.append(duplicate_label)
-        self.after(3000, duplicate_label.destroy)  # Remove the label after 3 seconds
+    def add_products_to_cart(self, products):
+        # A repeat scan adds one more unit to its line; a batch is one update
+        self.cart.add_many(products)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,106 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from catalog import ProductCatalog
+
+# CatalogSync against a local stand-in for the products API. The server answers
+# from `responses`, a list of (status, headers, products) used in order, and
+# records each request's query and headers in `requests`.
+
+
+def product(uid, price, updated, status='active'):
+    return {'uid': uid, 'name': f"Product {uid}", 'sellingPrice': price, 'status': status, 'updatedAt': updated}
+
+
+class StandIn(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.requests.append({'query': parse_qs(urlparse(self.path).query), 'headers': dict(self.headers)})
+        status, headers, products = server.responses.pop(0)
+        body = json.dumps(products).encode() if status == 200 else b''
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api():
+    server = HTTPServer(('127.0.0.1', 0), StandIn)
+    server.responses = []
+    server.requests = []
+    server.url = f"http://127.0.0.1:{server.server_port}/api/products"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def catalog(api, tmp_path):
+    catalog = ProductCatalog(api.url, path=str(tmp_path / "catalog.db"))
+    yield catalog
+    catalog.store.close()
+
+
+FULL = [product('1', 1.10, '2024-01-01'), product('2', 2.50, '2024-01-02'), product('3', 0.99, '2024-01-03')]
+
+
+def test_full_download_then_not_modified(api, catalog):
+    api.responses = [(200, {'ETag': '"v1"'}, FULL), (304, {}, None)]
+    assert set(catalog.refresh()) == {'1', '2', '3'}
+    assert catalog.products['1']['priceCents'] == 110
+    assert 'updatedSince' not in api.requests[0]['query']
+
+    assert set(catalog.refresh()) == {'1', '2', '3'}
+    assert catalog.last_changes == (0, 0)
+    assert api.requests[1]['headers']['If-None-Match'] == '"v1"'
+    assert api.requests[1]['query']['updatedSince'] == ['2024-01-03']
+
+
+def test_answer_without_header_is_a_full_list(api, catalog, tmp_path):
+    # As from a backend that ignores updatedSince: '3' was deleted on the server
+    api.responses = [(200, {}, FULL), (200, {}, [product('1', 1.10, '2024-01-01'), product('2', 3.00, '2024-02-01')])]
+    catalog.refresh()
+    products = catalog.refresh()
+
+    assert api.requests[1]['query']['updatedSince'] == ['2024-01-03']
+    assert set(products) == {'1', '2'}
+    assert products['2']['priceCents'] == 300
+    assert catalog.last_changes == (1, 1)
+    reloaded = ProductCatalog(api.url, path=str(tmp_path / "catalog.db"))
+    assert set(reloaded.products) == {'1', '2'}
+    reloaded.store.close()
+
+
+def test_delta_marked_by_server_keeps_missing(api, catalog):
+    changed = [product('2', 3.00, '2024-02-01'), product('3', 0.99, '2024-02-02', status='inactive')]
+    api.responses = [(200, {}, FULL), (200, {'X-Catalog-Delta': 'true'}, changed)]
+    catalog.refresh()
+    products = catalog.refresh()
+
+    assert set(products) == {'1', '2'}  # '1' is not mentioned but stays
+    assert catalog.last_changes == (1, 1)
+
+
+def test_full_list_marked_by_server_drops_missing(api, catalog):
+    api.responses = [(200, {}, FULL), (200, {'X-Catalog-Delta': 'false'}, FULL[:1])]
+    catalog.refresh()
+    assert set(catalog.refresh()) == {'1'}
+    assert catalog.last_changes == (0, 2)
+
+
+def test_delta_marked_by_server_on_first_sync(api, catalog):
+    api.responses = [(200, {'X-Catalog-Delta': 'true'}, FULL[:2]), (200, {'X-Catalog-Delta': '1'}, FULL[2:])]
+    catalog.refresh()
+    assert set(catalog.refresh()) == {'1', '2', '3'}
@@ -0,0 +1,119 @@
+import os
+import time
+
+import pytest
+
+from uhf import INVENTORY, NOTICE, FrameParser, RingBuffer, decode_inventory
+
+# The M100 protocol code on its own, and SerialTunnelReader against a pty
+# standing in for the reader's serial port.
+
+
+def frame(kind, command, parameters=b''):
+    body = bytes([kind, command, len(parameters) >> 8, len(parameters) & 0xFF]) + parameters
+    return bytes([0xBB]) + body + bytes([sum(body) & 0xFF, 0x7E])
+
+
+def notice(epc, rssi=0xC9):
+    # Inventory notice for `epc` (hex), with a PC and a CRC around it
+    return frame(NOTICE, INVENTORY, bytes([rssi]) + b'\x30\x00' + bytes.fromhex(epc) + b'\x12\x34')
+
+
+NO_TAG = bytes.fromhex("BB01FF000115167E")  # Error response to an inventory round without tags
+EPC_A = "E28011700000020D1C2A2B01"
+EPC_B = "E28011700000020D1C2A2B02"
+
+
+def test_ring_buffer_wraps_around():
+    buffer = RingBuffer(8)
+    buffer.write(b'abcdef')
+    buffer.consume(4)
+    buffer.write(b'ghijk')  # Wraps past the end of the bytearray
+    assert len(buffer) == 7
+    assert buffer.peek(7) == b'efghijk'
+    assert buffer[2] == ord('g')
+    assert buffer.find(ord('j')) == 5
+    assert buffer.find(ord('z')) == -1
+    assert buffer.dropped == 0
+
+
+def test_ring_buffer_drops_oldest_on_overflow():
+    buffer = RingBuffer(4)
+    buffer.write(b'abc')
+    buffer.write(b'def')
+    assert buffer.peek(len(buffer)) == b'cdef'
+    assert buffer.dropped == 2
+    buffer.write(b'0123456789')
+    assert buffer.peek(len(buffer)) == b'6789'
+    assert buffer.dropped == 12
+
+
+def test_parser_joins_frames_cut_anywhere():
+    stream = notice(EPC_A) + NO_TAG + notice(EPC_B)
+    parser = FrameParser()
+    frames = []
+    for i in range(0, len(stream), 3):
+        frames += parser.feed(stream[i:i + 3])
+    assert frames == [notice(EPC_A), NO_TAG, notice(EPC_B)]
+    assert parser.errors == 0
+
+
+def test_parser_skips_garbage_and_resyncs_after_bad_frame():
+    corrupt = bytearray(notice(EPC_A))
+    corrupt[-2] ^= 0xFF  # Checksum
+    parser = FrameParser()
+    frames = parser.feed(b'\x00\x7e\x11' + bytes(corrupt) + b'\xbb\xbb\xff\xff' + notice(EPC_B))
+    assert frames == [notice(EPC_B)]
+    assert parser.errors == 3  # The bad checksum and two headers with impossible lengths
+
+
+def test_decode_inventory_keeps_first_read_order_once():
+    frames = [notice(EPC_B), NO_TAG, notice(EPC_A), notice(EPC_B, rssi=0xB0)]
+    assert decode_inventory(frames) == [EPC_B, EPC_A]
+    assert decode_inventory([NO_TAG]) == []
+
+
+@pytest.fixture
+def tunnel():
+    pytest.importorskip("serial")
+    from uhf import SerialTunnelReader
+    master, slave = os.openpty()
+    reader = SerialTunnelReader(os.ttyname(slave), settle=0.1, max_age=0.4, start_command=None, stop_command=None)
+    yield master, reader
+    reader.close()
+    os.close(slave)
+    os.close(master)
+
+
+def poll_until_batch(reader, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        batch = reader.poll_batch()
+        if batch:
+            return batch
+        time.sleep(0.01)
+    return []
+
+
+def test_basket_pass_arrives_as_one_batch(tunnel):
+    master, reader = tunnel
+    os.write(master, notice(EPC_A)[:7])
+    time.sleep(0.02)
+    assert reader.poll_batch() == []
+    os.write(master, notice(EPC_A)[7:] + notice(EPC_B) + notice(EPC_A))
+    time.sleep(0.02)
+    assert reader.poll_batch() == []  # Not settled yet
+    assert poll_until_batch(reader) == [EPC_A, EPC_B]
+
+
+def test_error_frames_do_not_extend_a_pass(tunnel):
+    master, reader = tunnel
+    os.write(master, notice(EPC_A))
+    started = time.monotonic()
+    batch = []
+    while not batch and time.monotonic() - started < 2.0:
+        os.write(master, NO_TAG)  # The reader keeps answering empty rounds
+        batch = reader.poll_batch()
+        time.sleep(0.01)
+    assert batch == [EPC_A]
+    assert time.monotonic() - started < 0.3  # Ended by the settle time, not max_age
@@ -0,0 +1,86 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+CACHE_DIR = os.path.join("cache", "thumbnails")
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+THUMBNAIL_SIZE = (100, 100)
+
+
+def image_url(base_url, img_path):
+    return base_url + img_path.replace('\\', '/')
+
+
+def make_thumbnail(fp, size=THUMBNAIL_SIZE):
+    image = Image.open(fp).resize(size, Image.Resampling.LANCZOS)
+    if image.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+        image = image.convert('RGBA')  # e.g. CMYK JPEGs, which PNG cannot hold
+    return image
+
+
+class ThumbnailCache:
+    # Pre-resized product thumbnails on disk, one PNG per (image path, size).
+    # The directory is capped at max_bytes; the least recently used files go first.
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # file name -> size in bytes, oldest first
+        self.total_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+
+        # Rebuild the LRU order from the files left by earlier runs
+        files = []
+        for entry in os.scandir(directory):
+            if entry.is_file() and entry.name.endswith('.png'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self.entries[name] = size
+            self.total_bytes += size
+        self.evict()
+
+    def key(self, img_path, size):
+        return hashlib.sha1(f"{img_path}|{size[0]}x{size[1]}".encode()).hexdigest() + '.png'
+
+    def get(self, img_path, size=THUMBNAIL_SIZE):
+        name = self.key(img_path, size)
+        path = os.path.join(self.directory, name)
+        with self.lock:
+            if name not in self.entries:
+                return None
+            self.entries.move_to_end(name)
+        try:
+            with Image.open(path) as image:
+                image.load()
+            os.utime(path)  # Keep the LRU order across restarts
+            return image
+        except OSError:
+            with self.lock:
+                self.total_bytes -= self.entries.pop(name, 0)
+            return None
+
+    def put(self, img_path, image, size=THUMBNAIL_SIZE):
+        name = self.key(img_path, size)
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        image.save(tmp_path, 'PNG')
+        os.replace(tmp_path, path)
+        file_size = os.path.getsize(path)
+        with self.lock:
+            self.total_bytes += file_size - self.entries.pop(name, 0)
+            self.entries[name] = file_size
+        self.evict()
+
+    def evict(self):
+        with self.lock:
+            while self.total_bytes > self.max_bytes and self.entries:
+                name, size = self.entries.popitem(last=False)
+                self.total_bytes -= size
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
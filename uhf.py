@@ -0,0 +1,185 @@
+import time
+
+# Serial UHF readers for bulk ("tunnel") reads, speaking the M100/QM100 module
+# protocol: every frame is
+#
+#   0xBB, type, command, length (2 bytes, big endian), parameters, checksum, 0x7E
+#
+# with the checksum the low byte of the sum of type through parameters. In
+# continuous inventory the reader sends one notice frame (type 0x02, command
+# 0x22) per tag read, parameters RSSI (1), PC (2), EPC, CRC (2), many times
+# a second for every tag in the field.
+
+HEADER = 0xBB
+END = 0x7E
+NOTICE = 0x02
+INVENTORY = 0x22
+MAX_PARAMETERS = 255  # Longer length fields are line noise, not frames
+MULTI_POLL = bytes.fromhex("BB0027000322FFFF4A7E")  # Continuous inventory, 65535 rounds
+STOP_POLL = bytes.fromhex("BB00280000287E")
+BAUDRATE = 115200
+BUFFER_SIZE = 64 * 1024  # Bytes of unparsed input kept; the oldest are dropped beyond this
+SETTLE_TIME = 0.15  # Seconds without tag reads that end a pass through the tunnel
+# Seconds a batch is held at most, for tags that stay in the field. Kept below
+# the read filter's hold-off, so a tag left in the tunnel, which comes back in
+# every batch, is not counted again.
+MAX_BATCH_AGE = 0.5
+
+
+class RingBuffer:
+    # Fixed-size byte FIFO over one preallocated bytearray, so a stream of
+    # small serial reads never reallocates. Writing past the capacity drops
+    # the oldest bytes and counts them in `dropped`.
+    def __init__(self, capacity=BUFFER_SIZE):
+        self.data = bytearray(capacity)
+        self.capacity = capacity
+        self.start = 0
+        self.size = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        return self.data[(self.start + index) % self.capacity]
+
+    def write(self, chunk):
+        if len(chunk) > self.capacity:
+            self.dropped += len(chunk) - self.capacity
+            chunk = chunk[-self.capacity:]
+        overflow = self.size + len(chunk) - self.capacity
+        if overflow > 0:
+            self.consume(overflow)
+            self.dropped += overflow
+        end = (self.start + self.size) % self.capacity
+        first = min(len(chunk), self.capacity - end)
+        self.data[end:end + first] = chunk[:first]
+        self.data[:len(chunk) - first] = chunk[first:]
+        self.size += len(chunk)
+
+    def peek(self, count):
+        end = self.start + count
+        if end <= self.capacity:
+            return bytes(self.data[self.start:end])
+        return bytes(self.data[self.start:]) + bytes(self.data[:end - self.capacity])
+
+    def find(self, byte):
+        # Offset of the first `byte` from the read position, or -1
+        end = self.start + self.size
+        index = self.data.find(byte, self.start, min(end, self.capacity))
+        if index >= 0:
+            return index - self.start
+        if end > self.capacity:
+            index = self.data.find(byte, 0, end - self.capacity)
+            if index >= 0:
+                return index + self.capacity - self.start
+        return -1
+
+    def consume(self, count):
+        self.start = (self.start + count) % self.capacity
+        self.size -= count
+
+
+class FrameParser:
+    # Splits a byte stream into frames, however the serial reads cut it.
+    # Bytes before a header are skipped; a header whose frame has the wrong
+    # end byte or checksum is skipped alone, so the parser resyncs on the
+    # next 0xBB. `errors` counts the frames rejected.
+    def __init__(self, capacity=BUFFER_SIZE):
+        self.buffer = RingBuffer(capacity)
+        self.errors = 0
+
+    def feed(self, chunk):
+        buffer = self.buffer
+        buffer.write(chunk)
+        frames = []
+        while True:
+            start = buffer.find(HEADER)
+            if start < 0:
+                buffer.consume(len(buffer))
+                break
+            buffer.consume(start)
+            if len(buffer) < 5:
+                break
+            length = buffer[3] << 8 | buffer[4]
+            if length > MAX_PARAMETERS:
+                self.errors += 1
+                buffer.consume(1)
+                continue
+            if len(buffer) < length + 7:
+                break
+            frame = buffer.peek(length + 7)
+            if frame[-1] != END or sum(frame[1:-2]) & 0xFF != frame[-2]:
+                self.errors += 1
+                buffer.consume(1)
+                continue
+            buffer.consume(length + 7)
+            frames.append(frame)
+        return frames
+
+
+def is_inventory(frame):
+    return frame[1] == NOTICE and frame[2] == INVENTORY
+
+
+def decode_inventory(frames):
+    # EPCs (upper-case hex, the catalog's uid for UHF tags) of the inventory
+    # notices among `frames`, each once, in the order first read
+    epcs = {}
+    for frame in frames:
+        if is_inventory(frame):
+            length = frame[3] << 8 | frame[4]
+            epcs[frame[8:5 + length - 2].hex().upper()] = None  # Between PC and CRC
+    return list(epcs)
+
+
+class SerialTunnelReader:
+    # A UHF bulk reader on a serial port, kept in continuous inventory. Reads
+    # whatever bytes have arrived on each poll and parses them as they come,
+    # but hands tags on by the pass: poll_batch() returns the EPCs of a pass
+    # once no tag has been read for `settle` seconds (or the batch is `max_age`
+    # old), so a basket read in one go reaches the cart as one update. Other
+    # frames, such as the error response to each empty inventory round, do
+    # not extend a pass. pyserial is only imported here.
+    def __init__(self, port, baudrate=BAUDRATE, settle=SETTLE_TIME, max_age=MAX_BATCH_AGE,
+                 start_command=MULTI_POLL, stop_command=STOP_POLL):
+        import serial
+        self.name = port
+        self.serial = serial.Serial(port, baudrate, timeout=0)
+        self.parser = FrameParser()
+        self.settle = settle
+        self.max_age = max_age
+        self.stop_command = stop_command
+        self.frames = []  # Inventory frames of the pass in progress, decoded when it ends
+        self.first_frame = None
+        self.last_frame = None
+        if start_command:
+            self.serial.write(start_command)
+
+    def poll_batch(self):
+        now = time.monotonic()
+        data = self.serial.read(self.serial.in_waiting)
+        if data:
+            frames = [frame for frame in self.parser.feed(data) if is_inventory(frame)]
+            if frames:
+                self.frames.extend(frames)
+                self.last_frame = now
+                if self.first_frame is None:
+                    self.first_frame = now
+        if not self.frames:
+            return []
+        if now - self.last_frame < self.settle and now - self.first_frame < self.max_age:
+            return []
+        frames, self.frames = self.frames, []
+        self.first_frame = None
+        return decode_inventory(frames)
+
+    def close(self):
+        try:
+            if self.stop_command:
+                self.serial.write(self.stop_command)
+        finally:
+            self.serial.close()
+
+    def stats(self):
+        return {'frame_errors': self.parser.errors, 'bytes_dropped': self.parser.buffer.dropped}
@@ -0,0 +1,67 @@
+import math
+import queue
+import time
+
+DISPATCH_INTERVAL = 20  # Milliseconds between drains of the event queue
+FRAME_INTERVAL = 33  # Minimum milliseconds between two redraws of the same view
+
+
+class UIDispatcher:
+    # Hands work from worker threads (RFID reader, network calls, image and
+    # catalog downloads) to the Tk thread, the only one allowed to touch
+    # widgets. post() is safe from any thread; the Tk loop drains the queue on
+    # an after() tick and runs the calls in posting order. Redraws triggered by
+    # the calls are batched separately, see RedrawScheduler.
+    def __init__(self, root, interval=DISPATCH_INTERVAL):
+        self.root = root
+        self.interval = interval
+        self.events = queue.SimpleQueue()
+        self.root.after(self.interval, self.drain)
+
+    def post(self, func, *args):
+        self.events.put((func, args))
+
+    def drain(self):
+        try:
+            while True:
+                try:
+                    func, args = self.events.get_nowait()
+                except queue.Empty:
+                    break
+                self.run(func, args)
+        finally:
+            # Rescheduled only now, so a modal dialog opened by an event holds
+            # back the events queued behind it, as a direct call would
+            self.root.after(self.interval, self.drain)
+
+    def run(self, func, args):
+        try:
+            func(*args)
+        except Exception as e:
+            print(f"Error in UI event {getattr(func, '__name__', func)}: {e}")
+
+
+class RedrawScheduler:
+    # Batches redraws of one view: callers change their data right away and
+    # call mark_dirty(); render() then runs at most once per frame interval,
+    # however many changes came in. Tk thread only.
+    def __init__(self, root, render, interval=FRAME_INTERVAL):
+        self.root = root
+        self.render = render
+        self.interval = interval
+        self.after_id = None
+        self.last_render = 0.0
+
+    def mark_dirty(self):
+        if self.after_id is not None:
+            return  # Already scheduled, the pending render will include this change
+        wait = self.interval - (time.monotonic() - self.last_render) * 1000
+        if wait > 0:
+            self.after_id = self.root.after(math.ceil(wait), self.flush)
+        else:
+            self.after_id = self.root.after_idle(self.flush)
+
+    def flush(self):
+        self.after_id = None
+        self.last_render = time.monotonic()
+        self.render()